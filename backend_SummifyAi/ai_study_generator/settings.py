@@ -13,6 +13,10 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 from pathlib import Path
 import os
 from datetime import timedelta
+from dotenv import load_dotenv
+
+# Load the API keys and overrides from .env once, before any setting reads them
+load_dotenv()
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -88,6 +92,9 @@ REST_FRAMEWORK = {
 
 WSGI_APPLICATION = "ai_study_generator.wsgi.application"
 
+# Benchmarks are slow and timing dependent, they only run with `manage.py test --tag benchmark`
+TEST_RUNNER = "ai_study_generator.test_runner.TestRunner"
+
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
@@ -156,4 +163,87 @@ CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:5173",  # Add your frontend address if different
 ]
 
-CORS_ALLOW_CREDENTIALS = True
\ No newline at end of file
+CORS_ALLOW_CREDENTIALS = True
+
+# LLM clients, created once per process (see summarizing.clients)
+LLM_MODEL_NAME = "llama-3.1-70b-versatile"
+LLM_TEMPERATURE = 0.35
+LLM_HTTP_MAX_CONNECTIONS = 20
+LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS = 10
+LLM_HTTP_TIMEOUT = 120
+
+# Caches
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Per-page vision summaries, keyed by PDF content hash + page + prompt version
+    "pdf_pages": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "summifyai_pdf_page_cache",
+        "TIMEOUT": 60 * 60 * 24 * 30,
+        "OPTIONS": {"MAX_ENTRIES": 50000},
+    },
+    # Per-chunk mind map outlines, keyed by chunk content hash + prompt version
+    "mindmap_outlines": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "summifyai_mindmap_outline_cache",
+        "TIMEOUT": 60 * 60 * 24 * 30,
+        "OPTIONS": {"MAX_ENTRIES": 50000},
+    },
+    # Generated YouTube summaries, keyed by video ID + transcript language + prompt version
+    "yt_summaries": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "summifyai_yt_summary_cache",
+        "TIMEOUT": 60 * 60 * 24 * 7,
+        "OPTIONS": {"MAX_ENTRIES": 20000},
+    },
+}
+
+# Per-document FAISS indexes, stored under VECTOR_INDEX_ROOT/user_<id>/<content hash>
+VECTOR_INDEX_ROOT = BASE_DIR / "vector_indexes"
+VECTOR_INDEX_MAX_BYTES = 1024 * 1024 * 1024  # least recently used indexes are deleted above this
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "google")  # "google" (models/embedding-001) or "local" (CPU hashing)
+LOCAL_EMBEDDING_DIM = 768
+EMBEDDING_BATCH_SIZE = 100  # uncached chunks sent to the embedder per call
+VECTOR_STORE_CACHE_MAX_BYTES = 256 * 1024 * 1024  # loaded indexes kept in memory per process
+CONTEXT_STUFF_MAX_TOKENS = 6000  # documents up to this size are sent whole instead of through retrieval
+
+# Retained PDF uploads, stored once per content hash under pdfs/
+UPLOAD_MAX_BYTES = 2 * 1024 * 1024 * 1024  # the background reaper deletes the least recently used uploads above this
+UPLOAD_REAP_INTERVAL = 300  # seconds between reaper runs
+
+# Mind maps
+MINDMAP_MODE = "hierarchical"  # "hierarchical" outlines every chunk and merges them, "retrieval" uses the top-k chunks
+MINDMAP_MAX_WORKERS = 4
+MINDMAP_OUTLINE_CACHE_ALIAS = "mindmap_outlines"
+
+# Quizzes
+QUIZ_SHARDS = 3  # the summary is split and the quiz is generated by this many concurrent smaller calls, 1 disables it
+QUIZ_SHARD_CHARS = 2000
+QUIZ_SHARD_MAX_WORKERS = 4
+QUIZ_POOL_SIZE = int(os.getenv("QUIZ_POOL_SIZE", 2))  # quizzes pre-generated per PDF summary, 0 disables pre-generation
+QUIZ_POOL_WORKERS = int(os.getenv("QUIZ_POOL_WORKERS", 1))  # background quiz pre-generations run at once per process
+
+# YouTube summarization
+YT_TRANSCRIPT_LANGUAGES = ("en",)
+YT_TRANSCRIPT_TTL = 60 * 60 * 24 * 7  # seconds before a shared transcript is fetched again
+YT_SUMMARY_CACHE_ALIAS = "yt_summaries"
+YT_SUMMARY_TTL = 60 * 60 * 24 * 7
+YT_SINGLE_SHOT_MAX_CHARS = 60000  # longer transcripts are summarized section by section and merged
+YT_SECTION_CHARS = 20000
+YT_SECTION_MAX_WORKERS = 4
+
+# PDF summarization
+PDF_PAGE_CACHE_ALIAS = "pdf_pages"
+PDF_TEXT_LAYER_MAX_IMAGE_COVERAGE = 0.25  # pages with more of their area in images always use the vision model
+PDF_TEXT_BATCH_CHARS = 30000  # extracted text packed into one text-model call
+PDF_VISION_BATCH_PAGES = int(os.getenv("PDF_VISION_BATCH_PAGES", 1))  # page images packed into one vision call, 1 disables batching
+PDF_VISION_BATCH_BYTES = 4 * 1024 * 1024  # encoded image bytes packed into one vision call
+PDF_JOB_WORKERS = int(os.getenv("PDF_JOB_WORKERS", 2))  # background summarization jobs run at once per process
+PDF_JOB_STALE_AFTER = 30 * 60  # seconds without progress before a pending/running job is re-queued on startup
+PDF_RENDER_PROFILE = os.getenv("PDF_RENDER_PROFILE", "balanced")  # see summarizing.pdf_summarizer.RENDER_PROFILES
+PDF_VISION_MAX_WORKERS = int(os.getenv("PDF_VISION_MAX_WORKERS", 4))  # pages sent to the vision model at once
+PDF_VISION_TIMEOUT = float(os.getenv("PDF_VISION_TIMEOUT", 120))  # seconds before a single page model call is abandoned
@@ -0,0 +1,10 @@
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """Leaves @tag("benchmark") tests out of the default run, `manage.py test --tag benchmark` runs only them."""
+
+    def __init__(self, *args, tags=None, exclude_tags=None, **kwargs):
+        if "benchmark" not in (tags or []):
+            exclude_tags = [*(exclude_tags or []), "benchmark"]
+        super().__init__(*args, tags=tags, exclude_tags=exclude_tags, **kwargs)
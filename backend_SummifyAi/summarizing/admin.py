@@ -1,8 +1,11 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import YouTubeSummary,PDFSummary,GeneratedQuiz
+from .models import YouTubeTranscript,YouTubeSummary,PDFSummary,GeneratedQuiz,PDFSummaryJob,EmbeddingCacheEntry
 
 admin.site.register(YouTubeSummary)
 admin.site.register(PDFSummary)
-admin.site.register(GeneratedQuiz)
\ No newline at end of file
+admin.site.register(GeneratedQuiz)
+admin.site.register(PDFSummaryJob)
+admin.site.register(YouTubeTranscript)
+admin.site.register(EmbeddingCacheEntry)
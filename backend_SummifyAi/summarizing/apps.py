@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class SummarizingConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "summarizing"
+
+    def ready(self):
+        from django.core.signals import request_started
+        from .jobs import recover_stale_jobs_on_first_request
+
+        # Jobs orphaned by a restart are picked up again once the process serves traffic,
+        # management commands never touch them
+        request_started.connect(recover_stale_jobs_on_first_request)
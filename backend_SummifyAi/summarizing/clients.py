@@ -0,0 +1,84 @@
+import os
+import threading
+from django.conf import settings
+
+# Process-wide registry of long-lived model clients, so connection pools and TLS sessions are reused.
+# The SDKs behind them are heavy, so they are only imported when a client is first needed rather
+# than when Django starts a worker or runs a management command.
+_registry = {}
+# Reentrant because factories build their own dependencies, e.g. a chain creates the chat model
+_registry_lock = threading.RLock()
+
+
+def get_or_create(key, factory):
+    client = _registry.get(key)
+    if client is None:
+        with _registry_lock:
+            client = _registry.get(key)
+            if client is None:
+                client = _registry[key] = factory()
+    return client
+
+
+def get_http_client():
+    """Shared keep-alive HTTP connection pool for the LLM clients."""
+    import httpx
+
+    return get_or_create("http_client", lambda: httpx.Client(
+        limits=httpx.Limits(
+            max_connections=getattr(settings, "LLM_HTTP_MAX_CONNECTIONS", 20),
+            max_keepalive_connections=getattr(settings, "LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS", 10),
+        ),
+        timeout=getattr(settings, "LLM_HTTP_TIMEOUT", 120),
+    ))
+
+
+def get_chat_model():
+    from langchain_groq import ChatGroq
+
+    model_name = getattr(settings, "LLM_MODEL_NAME", "llama-3.1-70b-versatile")
+    temperature = getattr(settings, "LLM_TEMPERATURE", 0.35)
+    return get_or_create(("chat_model", model_name, temperature), lambda: ChatGroq(
+        model_name=model_name, temperature=temperature, http_client=get_http_client()
+    ))
+
+
+def get_qa_chain(prompt_template):
+    """Returns the shared "stuff" question answering chain for a prompt template."""
+    def build():
+        from langchain.chains.question_answering import load_qa_chain
+        from langchain.prompts import PromptTemplate
+
+        prompt = PromptTemplate(template=prompt_template, input_variables=["context", "question"])
+        return load_qa_chain(get_chat_model(), chain_type="stuff", prompt=prompt)
+
+    return get_or_create(("qa_chain", prompt_template), build)
+
+
+def get_google_embeddings(model_name):
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    return get_or_create(("google_embeddings", model_name), lambda: GoogleGenerativeAIEmbeddings(model=model_name))
+
+
+def get_genai():
+    """Imports and configures the Gemini SDK once, on first use."""
+    def configure():
+        import google.generativeai as genai
+
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        return genai
+
+    return get_or_create("genai", configure)
+
+
+def get_generative_model(model_name):
+    return get_or_create(("generative_model", model_name), lambda: get_genai().GenerativeModel(model_name=model_name))
+
+
+def get_text_splitter(chunk_size=10000, chunk_overlap=1000):
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    return get_or_create(("text_splitter", chunk_size, chunk_overlap), lambda: RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    ))
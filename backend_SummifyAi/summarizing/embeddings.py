@@ -0,0 +1,120 @@
+import hashlib
+import logging
+import re
+import zlib
+import numpy as np
+from django.conf import settings
+from langchain_core.embeddings import Embeddings
+from .models import EmbeddingCacheEntry
+from .clients import get_google_embeddings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = "models/embedding-001"
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an embedder with a content-hash keyed cache of float32 vectors stored in the database."""
+
+    def __init__(self, embeddings, model_name, batch_size=None):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.batch_size = batch_size or getattr(settings, "EMBEDDING_BATCH_SIZE", 100)
+        # cached: found in the cache, embedded: sent to the embedder, deduplicated: repeats within one call
+        self.stats = {"cached": 0, "embedded": 0, "deduplicated": 0, "calls": 0}
+
+    def cache_key(self, kind, text):
+        # Documents and queries are embedded differently by some providers, so they never share keys
+        return hashlib.sha256(f"{self.model_name}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def embed_documents(self, texts):
+        keys = [self.cache_key("document", text) for text in texts]
+        cached = {
+            entry.key: np.frombuffer(entry.vector, dtype=np.float32).tolist()
+            for entry in EmbeddingCacheEntry.objects.filter(key__in=set(keys))
+        }
+
+        hits = sum(1 for key in keys if key in cached)
+
+        # Identical chunks are only embedded once, even within the same request
+        missing = {key: text for key, text in zip(keys, texts) if key not in cached}
+        missing_keys = list(missing)
+        for start in range(0, len(missing_keys), self.batch_size):
+            batch = missing_keys[start:start + self.batch_size]
+            vectors = self.embeddings.embed_documents([missing[key] for key in batch])
+            self.stats["calls"] += 1
+            EmbeddingCacheEntry.objects.bulk_create(
+                [
+                    EmbeddingCacheEntry(key=key, model=self.model_name, vector=np.asarray(vector, dtype=np.float32).tobytes())
+                    for key, vector in zip(batch, vectors)
+                ],
+                ignore_conflicts=True,
+            )
+            cached.update(zip(batch, vectors))
+
+        self.stats["cached"] += hits
+        self.stats["embedded"] += len(missing)
+        self.stats["deduplicated"] += len(texts) - hits - len(missing)
+        return [list(cached[key]) for key in keys]
+
+    def embed_query(self, text):
+        key = self.cache_key("query", text)
+        entry = EmbeddingCacheEntry.objects.filter(key=key).first()
+        if entry is not None:
+            self.stats["cached"] += 1
+            return np.frombuffer(entry.vector, dtype=np.float32).tolist()
+
+        vector = self.embeddings.embed_query(text)
+        self.stats["calls"] += 1
+        self.stats["embedded"] += 1
+        EmbeddingCacheEntry.objects.bulk_create(
+            [EmbeddingCacheEntry(key=key, model=self.model_name, vector=np.asarray(vector, dtype=np.float32).tobytes())],
+            ignore_conflicts=True,
+        )
+        return vector
+
+
+class HashingEmbeddings(Embeddings):
+    """Local CPU embedder: signed feature hashing of word unigrams and bigrams with sublinear term frequency."""
+
+    TOKEN_PATTERN = re.compile(r"\w+")
+
+    def __init__(self, dim=768):
+        self.dim = dim
+        self.model_name = f"local-hashing-{dim}"
+
+    def features(self, text):
+        tokens = self.TOKEN_PATTERN.findall(text.lower())
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def embed_documents(self, texts):
+        rows, columns, signs = [], [], []
+        for row, text in enumerate(texts):
+            for feature in self.features(text):
+                # crc32 is stable across processes, unlike hash(), so saved indexes stay valid
+                h = zlib.crc32(feature.encode("utf-8"))
+                rows.append(row)
+                columns.append(h % self.dim)
+                signs.append(1.0 if h & 0x80000000 else -1.0)
+
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(matrix, (np.array(rows, dtype=np.intp), np.array(columns, dtype=np.intp)), np.array(signs, dtype=np.float32))
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+        return matrix.tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def get_embeddings():
+    """Returns the embedder used for every vector store, picked by the EMBEDDING_PROVIDER setting."""
+    provider = getattr(settings, "EMBEDDING_PROVIDER", "google")
+    if provider == "local":
+        # Local embeddings are cheaper to recompute than to look up, so they skip the cache
+        return HashingEmbeddings(dim=getattr(settings, "LOCAL_EMBEDDING_DIM", 768))
+    if provider == "google":
+        return CachedEmbeddings(get_google_embeddings(EMBEDDING_MODEL), EMBEDDING_MODEL)
+    raise ValueError(f"Unknown EMBEDDING_PROVIDER: {provider}")
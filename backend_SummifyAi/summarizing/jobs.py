@@ -0,0 +1,190 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from user_profile.models import UserContribution, UserStatistics
+from .locks import key_lock
+from .models import PDFSummary, PDFSummaryJob, GeneratedQuiz
+from .pdf_summarizer import summarize_pdf, count_pages_in_range
+from .uploads import store_upload
+
+logger = logging.getLogger(__name__)
+
+# In-process worker pools, jobs live in the database so no external broker is needed
+_executor = None
+_quiz_executor = None
+_executor_lock = threading.Lock()
+_recovery_started = False
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "PDF_JOB_WORKERS", 2),
+                thread_name_prefix="pdf-summary-job",
+            )
+        return _executor
+
+
+def get_quiz_executor():
+    global _quiz_executor
+    with _executor_lock:
+        if _quiz_executor is None:
+            _quiz_executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "QUIZ_POOL_WORKERS", 1),
+                thread_name_prefix="quiz-pool",
+            )
+        return _quiz_executor
+
+
+def save_pdf_summary(user, pdf_file_name, start_page, end_page, summaries):
+    """Stores the finished summary and bumps the user's contribution and statistics."""
+    summary_text = "\n".join([f"Page {num}: {summ}" for num, summ in summaries.items()])
+
+    # Save the summary with start and end page numbers
+    pdf_summary = PDFSummary(
+        user=user,
+        pdf_file=pdf_file_name,
+        start_page_number=start_page,
+        end_page_number=end_page,
+        summary=summary_text
+    )
+    pdf_summary.save()
+    UserContribution.objects.create(user=user, contribution_type='pdf_summary')
+
+    # Increment the pdfs_summarized count in UserStatistics
+    user_statistics = UserStatistics.objects.get(user=user)
+    user_statistics.pdfs_summarized += 1
+    user_statistics.save()
+
+    # Warm the quiz pool so the first "generate quiz" does not wait on the model
+    transaction.on_commit(lambda: schedule_quiz_pool(pdf_summary.id))
+    return pdf_summary
+
+
+def submit_pdf_summary_job(user, pdf_file, start_page, end_page):
+    """Stores the upload and queues it for summarization, returns the job right away."""
+    job = PDFSummaryJob.objects.create(
+        user=user,
+        pdf_file=store_upload(pdf_file),
+        start_page_number=start_page,
+        end_page_number=end_page,
+    )
+    transaction.on_commit(lambda: get_executor().submit(run_pdf_summary_job, job.id))
+    return job
+
+
+def run_pdf_summary_job(job_id):
+    try:
+        job = PDFSummaryJob.objects.get(id=job_id)
+        job.status = 'running'
+        job.save(update_fields=['status', 'updated_at'])
+
+        with job.pdf_file.open('rb') as pdf_file:
+            job.total_pages = count_pages_in_range(pdf_file, job.start_page_number, job.end_page_number)
+            job.save(update_fields=['total_pages', 'updated_at'])
+
+            def on_progress(done):
+                job.page_summaries.update({str(page_num): summary for page_num, summary in done.items()})
+                job.save(update_fields=['page_summaries', 'updated_at'])
+
+            summaries, page_stats = summarize_pdf(
+                pdf_file, job.start_page_number, job.end_page_number, on_progress=on_progress
+            )
+        if not summaries and page_stats['failed_pages']:
+            raise RuntimeError(f"The model did not answer for pages {page_stats['failed_pages']}")
+
+        job.pdf_summary = save_pdf_summary(
+            job.user, job.pdf_file.name, job.start_page_number, job.end_page_number, summaries
+        )
+        job.page_stats = page_stats
+        job.status = 'completed'
+        job.save(update_fields=['pdf_summary', 'page_stats', 'status', 'updated_at'])
+    except Exception as e:
+        logger.exception(f"PDF summary job {job_id} failed")
+        PDFSummaryJob.objects.filter(id=job_id).update(status='failed', error=str(e))
+    finally:
+        close_old_connections()
+
+
+def recover_stale_jobs():
+    """Re-queues jobs left pending or running by a process that stopped, returns their ids.
+
+    The queue only lives in process memory, so after a restart nothing would ever pick those jobs up
+    again and the upload reaper would keep their files forever. Jobs that saw no progress for
+    PDF_JOB_STALE_AFTER seconds are treated as orphaned, pages finished before are served from the page cache.
+    """
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, "PDF_JOB_STALE_AFTER", 30 * 60))
+    stale = PDFSummaryJob.objects.filter(status__in=['pending', 'running'], updated_at__lt=cutoff)
+
+    requeued = []
+    try:
+        for job_id in list(stale.values_list('id', flat=True)):
+            # The conditional update lets only one worker process claim each job
+            if stale.filter(id=job_id).update(status='pending', updated_at=timezone.now()):
+                get_executor().submit(run_pdf_summary_job, job_id)
+                requeued.append(job_id)
+        if requeued:
+            logger.info(f"Re-queued stale PDF summary jobs {requeued}")
+        return requeued
+    finally:
+        close_old_connections()
+
+
+def recover_stale_jobs_on_first_request(**kwargs):
+    """request_started receiver that runs recover_stale_jobs once per process, off the request thread."""
+    global _recovery_started
+    with _executor_lock:
+        if _recovery_started:
+            return
+        _recovery_started = True
+    request_started.disconnect(recover_stale_jobs_on_first_request)
+    get_executor().submit(recover_stale_jobs)
+
+
+def schedule_quiz_pool(pdf_summary_id):
+    if getattr(settings, "QUIZ_POOL_SIZE", 2) > 0:
+        get_quiz_executor().submit(fill_quiz_pool, pdf_summary_id)
+
+
+def fill_quiz_pool(pdf_summary_id):
+    """Pre-generates unserved quizzes for a summary until QUIZ_POOL_SIZE of them are waiting."""
+    lock = key_lock(f"quiz_pool:{pdf_summary_id}")
+    # A filler already running for this summary re-checks the pool after every quiz, so this one can stop
+    if not lock.acquire(blocking=False):
+        return
+    try:
+        # The view owns the prompts and chains, imported here since views imports this module
+        from .views import QuizGeneratorView
+
+        pdf_summary = PDFSummary.objects.get(id=pdf_summary_id)
+        generator = QuizGeneratorView()
+
+        # Build the retrieval index up front, so on-demand quizzes never wait for the embeddings
+        generator.prepare_context(pdf_summary.summary, pdf_summary.user)
+        while GeneratedQuiz.objects.filter(pdf_summary=pdf_summary, served=False).count() < getattr(settings, "QUIZ_POOL_SIZE", 2):
+            quiz_json = generator.generate_quiz(pdf_summary.summary, pdf_summary.user)
+            GeneratedQuiz.objects.create(user=pdf_summary.user, pdf_summary=pdf_summary, quiz_data=quiz_json, served=False)
+    except PDFSummary.DoesNotExist:
+        pass
+    except Exception:
+        logger.exception(f"Quiz pre-generation for PDF summary {pdf_summary_id} failed")
+    finally:
+        lock.release()
+        close_old_connections()
+
+
+def claim_pregenerated_quiz(pdf_summary):
+    """Marks the oldest unserved quiz of the summary as served and returns it, or None when the pool is empty."""
+    for quiz in GeneratedQuiz.objects.filter(pdf_summary=pdf_summary, served=False).order_by('created_at'):
+        # The conditional update makes sure two requests never get the same quiz
+        if GeneratedQuiz.objects.filter(id=quiz.id, served=False).update(served=True):
+            quiz.served = True
+            return quiz
+    return None
@@ -0,0 +1,40 @@
+import threading
+import weakref
+
+# Only locks somebody still references stay registered, so keys do not pile up for the life of the process
+_locks = weakref.WeakValueDictionary()
+_locks_guard = threading.Lock()
+
+
+class KeyLock:
+    """threading.Lock wrapper, plain locks cannot be weakly referenced."""
+
+    __slots__ = ("_lock", "__weakref__")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def acquire(self, blocking=True, timeout=-1):
+        return self._lock.acquire(blocking, timeout)
+
+    def release(self):
+        self._lock.release()
+
+    def __enter__(self):
+        self._lock.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+
+
+def key_lock(key):
+    """Returns the process-wide lock for key, so concurrent work on the same key runs only once.
+
+    Callers keep the lock referenced while they wait for or hold it, `with key_lock(key):` does.
+    """
+    with _locks_guard:
+        lock = _locks.get(key)
+        if lock is None:
+            lock = _locks[key] = KeyLock()
+        return lock
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from summarizing.models import YouTubeSummary, YouTubeTranscript
+from summarizing.yt_cache import get_languages
+from summarizing.yt_summarizer import extract_video_id
+
+
+class Command(BaseCommand):
+    help = "Moves transcripts stored on YouTubeSummary rows into shared YouTubeTranscript rows, one per video."
+
+    def handle(self, *args, **options):
+        language = ",".join(get_languages())
+        linked = skipped = 0
+
+        for summary in YouTubeSummary.objects.filter(shared_transcript__isnull=True).exclude(transcript=""):
+            try:
+                video_id = extract_video_id(summary.youtube_url)
+            except ValueError:
+                skipped += 1
+                continue
+
+            with transaction.atomic():
+                transcript, created = YouTubeTranscript.objects.get_or_create(
+                    video_id=video_id, language=language, defaults={"text": summary.transcript}
+                )
+                if created:
+                    # Age it like the summary so YT_TRANSCRIPT_TTL refetches it with its timestamps
+                    YouTubeTranscript.objects.filter(id=transcript.id).update(fetched_at=summary.created_at)
+                summary.shared_transcript = transcript
+                summary.transcript = ""
+                summary.save(update_fields=["shared_transcript", "transcript"])
+            linked += 1
+
+        self.stdout.write(f"Linked {linked} summaries to shared transcripts, skipped {skipped} without a video ID.")
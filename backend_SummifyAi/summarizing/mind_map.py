@@ -1,67 +1,237 @@
-import os
+import re
+import json
+import hashlib
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from PyPDF2 import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-import google.generativeai as genai
-from langchain_groq import ChatGroq
-from langchain.vectorstores import FAISS
-from langchain.chains.question_answering import load_qa_chain
-from langchain.prompts import PromptTemplate
-from dotenv import load_dotenv
-
-load_dotenv()
-# Load the environment variables
-api_key = os.getenv("GOOGLE_API_KEY")
-genai.configure(api_key=api_key)
+from django.conf import settings
+from django.core.cache import caches
+from .vector_store import get_context_documents
+from .clients import get_qa_chain, get_text_splitter
+from .pdf_summarizer import open_pdf_document
+
+logger = logging.getLogger(__name__)
+
+MINDMAP_QUESTION = """Generate a mind map of the document in JSON format. 
+        Here's an example of the expected output:
+        {
+            "title": "Document Title",
+            "nodes": [
+                {
+                    "id": "1",
+                    "text": "Main Topic",
+                    "nodes": [
+                        {
+                            "id": "1.1",
+                            "text": "Subtopic 1"
+                        },
+                        {
+                            "id": "1.2",
+                            "text": "Subtopic 2"
+                        }
+                    ]
+                }
+            ]
+        }"""
+
+OUTLINE_QUESTION = MINDMAP_QUESTION + """
+        The context is only one part of a longer document. Outline every topic of this part with its
+        subtopics, key terms and formulas. Reply with the JSON only."""
+
+# Bump this whenever OUTLINE_QUESTION changes so stale chunk outlines are not reused
+OUTLINE_PROMPT_VERSION = "v1"
+
+# Bump this whenever MINDMAP_QUESTION changes so stored retrieval mind maps are not reused
+MINDMAP_PROMPT_VERSION = "v1"
+
+
+def get_mindmap_version():
+    """Identifies how mind maps are generated right now, stored maps from another version are not served."""
+    mode = getattr(settings, "MINDMAP_MODE", "hierarchical")
+    version = OUTLINE_PROMPT_VERSION if mode == "hierarchical" else MINDMAP_PROMPT_VERSION
+    return f"{mode}:{version}"
+
+def iter_pdf_page_texts(pdf):
+    """Yields the text of each page of a PDF lazily, with PyMuPDF and PyPDF2 as a fallback."""
+    try:
+        document = open_pdf_document(pdf)
+    except Exception as e:
+        logger.warning(f"PyMuPDF could not open the PDF, falling back to PyPDF2: {e}")
+        pdf.seek(0)
+        for page in PdfReader(pdf).pages:
+            yield page.extract_text() or ""
+        return
+
+    try:
+        for page in document:
+            yield page.get_text()
+    finally:
+        document.close()
+
 
 def get_pdf_text(pdf_docs):
     """Extracts text from PDF documents."""
-    text = ""
-    for pdf in pdf_docs:
-        pdf_reader = PdfReader(pdf)
-        for page in pdf_reader.pages:
-            text += page.extract_text()
-    return text
+    return "\n".join(text for pdf in pdf_docs for text in iter_pdf_page_texts(pdf))
 
 
 def get_text_chunks(text):
     """Splits the extracted text into smaller chunks for processing."""
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=10000, chunk_overlap=1000)
+    text_splitter = get_text_splitter(chunk_size=10000, chunk_overlap=1000)
     chunks = text_splitter.split_text(text)
     return chunks
 
 
-def get_vector_store(text_chunks):
-    """Embeds text chunks and creates a vector store."""
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    vector_store = FAISS.from_texts(text_chunks, embedding=embeddings)
-    vector_store.save_local("faiss_index")
+def iter_text_chunks(page_texts, chunk_size=10000, chunk_overlap=1000):
+    """Splits a stream of page texts into chunks without ever holding the whole document as one string."""
+    text_splitter = get_text_splitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    buffer = ""
+    for text in page_texts:
+        buffer = f"{buffer}\n{text}" if buffer else text
+        if len(buffer) >= 2 * chunk_size:
+            chunks = text_splitter.split_text(buffer)
+            # The last chunk may continue on the next page, so it is split again with what follows
+            yield from chunks[:-1]
+            buffer = chunks[-1] if chunks else ""
+    if buffer:
+        yield from text_splitter.split_text(buffer)
 
 
-def get_conversational_chain():
-    """Creates a conversational chain using the ChatGroq model."""
-    prompt_template = """
+MINDMAP_PROMPT_TEMPLATE = """
     Answer the question as detailed as possible from the provided context. If the answer is not available in the context, say, 'answer is not available in the context'. Don't provide wrong answers.\n\n
     Context:\n {context}?\n
     Question: \n{question}\n
     Answer:
     """
 
-    model = ChatGroq(model_name="llama-3.1-70b-versatile", temperature=0.35)
-    prompt = PromptTemplate(template=prompt_template, input_variables=["context", "question"])
-    chain = load_qa_chain(model, chain_type="stuff", prompt=prompt)
 
-    return chain
+def get_conversational_chain():
+    """Returns the shared conversational chain using the ChatGroq model."""
+    return get_qa_chain(MINDMAP_PROMPT_TEMPLATE)
+
+
+def load_mindmap_json(text):
+    """Returns the {"title", "nodes"} tree in an LLM reply, tolerating text around the JSON, or None."""
+    start = text.find('{')
+    end = text.rfind('}')
+    if start != -1 and end != -1:
+        try:
+            mindmap = json.loads(text[start:end + 1])
+            if isinstance(mindmap, dict):
+                return {"title": mindmap.get("title", ""), "nodes": mindmap.get("nodes") or []}
+        except json.JSONDecodeError:
+            pass
+    return None
+
+
+def parse_mindmap_json(text):
+    """Parses the {"title", "nodes"} tree out of an LLM reply, keeping an unparseable reply as a single node."""
+    mindmap = load_mindmap_json(text)
+    if mindmap is None:
+        # Keep the reply as a single node rather than losing it
+        return {"title": "", "nodes": [{"text": text.strip()}]}
+    return mindmap
+
+
+def normalize_node_text(text):
+    return re.sub(r"\W+", " ", str(text)).strip().lower()
+
+
+def merge_nodes(target, nodes):
+    """Merges nodes into target in place, joining nodes with the same text and merging their children."""
+    by_text = {normalize_node_text(node["text"]): node for node in target}
+    for node in nodes:
+        if not isinstance(node, dict):
+            continue
+        key = normalize_node_text(node.get("text", ""))
+        if key not in by_text:
+            by_text[key] = {"text": node.get("text", ""), "nodes": []}
+            target.append(by_text[key])
+        merge_nodes(by_text[key]["nodes"], node.get("nodes") or [])
+    return target
+
+
+def number_nodes(nodes, prefix=""):
+    """Returns the nodes with hierarchical ids ("1", "1.1", ...) and without empty child lists."""
+    numbered = []
+    for index, node in enumerate(nodes, start=1):
+        node_id = f"{prefix}{index}"
+        numbered_node = {"id": node_id, "text": node["text"]}
+        if node.get("nodes"):
+            numbered_node["nodes"] = number_nodes(node["nodes"], f"{node_id}.")
+        numbered.append(numbered_node)
+    return numbered
+
+
+def outline_chunk(chunk):
+    """Outlines one chunk of the document, reusing the cached outline when the chunk was seen before."""
+    cache = caches[getattr(settings, "MINDMAP_OUTLINE_CACHE_ALIAS", "default")]
+    key = f"mindmap_outline:{OUTLINE_PROMPT_VERSION}:{hashlib.sha256(chunk.encode('utf-8')).hexdigest()}"
+    outline = cache.get(key)
+    if outline is None:
+        from langchain_core.documents import Document
+
+        chain = get_conversational_chain()
+        response = chain({"input_documents": [Document(page_content=chunk)], "question": OUTLINE_QUESTION}, return_only_outputs=True)
+        outline = load_mindmap_json(response["output_text"])
+        if outline is None or not outline["nodes"]:
+            # Left out of this mind map and not cached, so the next run asks the model again
+            logger.warning(f"Outline of chunk {key} could not be parsed")
+            return {"title": "", "nodes": []}
+        cache.set(key, outline)
+    return outline
+
+
+def generate_hierarchical_mindmap(text_chunks):
+    """Outlines every chunk concurrently and merges the outlines into one tree for the whole document.
+
+    text_chunks may be a generator, it is only read as fast as chunks are outlined so that a long
+    document never has more than a few chunks in memory.
+    """
+    max_workers = getattr(settings, "MINDMAP_MAX_WORKERS", 4)
+    title, nodes, chunk_count = "", [], 0
+    in_flight = deque()
+
+    def merge_next():
+        nonlocal title
+        outline = in_flight.popleft().result()
+        title = title or outline["title"]
+        merge_nodes(nodes, outline["nodes"])
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for chunk in text_chunks:
+            # Keep every worker busy with one chunk queued behind it, and no more
+            if len(in_flight) >= 2 * max_workers:
+                merge_next()
+            in_flight.append(executor.submit(outline_chunk, chunk))
+            chunk_count += 1
+        # Outlines are merged in document order, so the tree is the same however the calls finish
+        while in_flight:
+            merge_next()
+
+    if not chunk_count:
+        raise ValueError("No text could be extracted from the PDF to build a mind map from.")
+    if not nodes:
+        raise ValueError("The model did not return an outline for any part of the PDF.")
+    return {"title": title, "nodes": number_nodes(nodes)}
+
+
+def generate_mindmap(text_chunks, user, user_question=MINDMAP_QUESTION):
+    """Generates a mind map of the PDF content, see the MINDMAP_MODE setting.
+
+    Raises ValueError when the PDF has no text or the model returns nothing usable.
+    """
+    if getattr(settings, "MINDMAP_MODE", "hierarchical") == "hierarchical":
+        return generate_hierarchical_mindmap(text_chunks)
 
+    # Retrieval hashes and indexes the whole document, so it needs every chunk at once
+    text_chunks = list(text_chunks)
+    if not text_chunks:
+        raise ValueError("No text could be extracted from the PDF to build a mind map from.")
 
-def generate_mindmap(user_question):
-    """Generates a mind map based on the user question and PDF content."""
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    vector_store = FAISS.load_local("faiss_index", embeddings, allow_dangerous_deserialization=True)
-    docs = vector_store.similarity_search(user_question)
+    docs = get_context_documents(user, text_chunks, user_question)
 
     chain = get_conversational_chain()
     response = chain({"input_documents": docs, "question": user_question}, return_only_outputs=True)
 
-    return response["output_text"]
+    return parse_mindmap_json(response["output_text"])
@@ -1,10 +1,29 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+class YouTubeTranscript(models.Model):
+    # One shared copy of a video's transcript, reused by every user who summarizes it
+    video_id = models.CharField(max_length=20)
+    language = models.CharField(max_length=50)
+    text = models.TextField()
+    items = models.JSONField(default=list)  # Raw transcript items with start/duration timestamps
+    fetched_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('video_id', 'language')
+
+    def __str__(self):
+        return f"Transcript of {self.video_id} ({self.language})"
+
+
 class YouTubeSummary(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="summaries")
     youtube_url = models.URLField(max_length=500)
-    transcript = models.TextField()
+    shared_transcript = models.ForeignKey(
+        YouTubeTranscript, on_delete=models.PROTECT, related_name="summaries", null=True, blank=True
+    )
+    # Copy stored before transcripts were shared, moved over by `manage.py backfill_youtube_transcripts`
+    transcript = models.TextField(blank=True, default="")
     summary = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -26,10 +45,37 @@ class PDFSummary(models.Model):
     
 
 
+class PDFSummaryJob(models.Model):
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="pdf_summary_jobs")
+    pdf_file = models.FileField(upload_to='pdfs/')
+    start_page_number = models.IntegerField()
+    end_page_number = models.IntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    total_pages = models.IntegerField(default=0)
+    page_summaries = models.JSONField(default=dict)  # {page_num: summary} for finished pages
+    page_stats = models.JSONField(default=dict)
+    error = models.TextField(blank=True)
+    pdf_summary = models.ForeignKey(PDFSummary, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Summary job {self.id} ({self.status}) by {self.user.username} for {self.pdf_file.name}"
+
+
 class GeneratedQuiz(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     pdf_summary = models.ForeignKey(PDFSummary, on_delete=models.CASCADE)
     quiz_data = models.JSONField()
+    # Pre-generated variants wait unserved in the pool until QuizGeneratorView hands them out
+    served = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -40,9 +86,21 @@ class GeneratedQuiz(models.Model):
 class PDFMindMap(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="mindmaps")
     pdf_file = models.FileField(upload_to='pdfs/')
+    content_hash = models.CharField(max_length=64, db_index=True, blank=True)  # sha256 of the PDF bytes
+    mindmap_version = models.CharField(max_length=50, blank=True)  # mode and prompt version, see get_mindmap_version
     mindmap_json = models.JSONField()  # Store the mind map as JSON
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"Mindmap by {self.user.username} for {self.pdf_file.name}"
 
+
+class EmbeddingCacheEntry(models.Model):
+    # sha256 of model + kind + text, vector is stored as a compact float32 blob
+    key = models.CharField(max_length=64, unique=True)
+    model = models.CharField(max_length=100)
+    vector = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Embedding {self.key[:12]} ({self.model})"
@@ -0,0 +1,52 @@
+import hashlib
+import threading
+from django.conf import settings
+from django.core.cache import caches
+
+# Bump this whenever the vision prompt changes so stale summaries are not served
+PROMPT_VERSION = "v1"
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def get_cache():
+    return caches[getattr(settings, "PDF_PAGE_CACHE_ALIAS", "default")]
+
+
+def hash_pdf_file(pdf_file):
+    """Returns the sha256 hex digest of an uploaded PDF, leaving the file at position 0."""
+    digest = hashlib.sha256()
+    pdf_file.seek(0)
+    for chunk in pdf_file.chunks():
+        digest.update(chunk)
+    pdf_file.seek(0)
+    return digest.hexdigest()
+
+
+def page_key(pdf_hash, page_num):
+    # The rendering profile changes what the model sees, so it is part of the key too
+    profile = getattr(settings, "PDF_RENDER_PROFILE", "balanced")
+    return f"pdf_page:{PROMPT_VERSION}:{profile}:{pdf_hash}:{page_num}"
+
+
+def get_cached_pages(pdf_hash, page_nums):
+    """Returns {page_num: summary} for the pages already in the cache."""
+    page_nums = list(page_nums)
+    keys = {page_key(pdf_hash, page_num): page_num for page_num in page_nums}
+    found = get_cache().get_many(list(keys))
+    cached = {keys[key]: summary for key, summary in found.items()}
+
+    with _stats_lock:
+        _stats["hits"] += len(cached)
+        _stats["misses"] += len(page_nums) - len(cached)
+    return cached
+
+
+def cache_pages(pdf_hash, summaries):
+    get_cache().set_many({page_key(pdf_hash, page_num): summary for page_num, summary in summaries.items()})
+
+
+def get_cache_stats():
+    with _stats_lock:
+        return dict(_stats)
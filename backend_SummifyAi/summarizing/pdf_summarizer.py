@@ -1,75 +1,148 @@
-from pdf2image import convert_from_path
-import google.generativeai as genai
 from PIL import Image
 from io import BytesIO
-import os
-from dotenv import load_dotenv
 import fitz
-from langchain.vectorstores import FAISS
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain.chains.question_answering import load_qa_chain
-import os
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_groq import ChatGroq
-from langchain.vectorstores import FAISS
-from langchain.chains.question_answering import load_qa_chain
-from langchain.prompts import PromptTemplate
-import google.generativeai as genai
-from dotenv import load_dotenv
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from django.conf import settings
+import re
+from .page_cache import hash_pdf_file, get_cached_pages, cache_pages
+from .vector_store import get_context_documents
+from .clients import get_qa_chain, get_generative_model
 
+logger = logging.getLogger(__name__)
 
-load_dotenv()  # Load environment variables from.env file
+VISION_MODEL_NAME = "gemini-1.5-flash"
+# Cheaper model for pages whose text layer can be summarized directly
+TEXT_MODEL_NAME = "gemini-1.5-flash-8b"
 
+# Rendering profiles for vision payloads. "dpi" and "grayscale" control rasterization,
+# "max_dimension" downscales the longest side, "format"/"quality" control the encoding and
+# "text_min_chars" lets pages with a good text layer skip rasterization and vision inference
+# entirely (see classify_page).
+RENDER_PROFILES = {
+    "lossless": {"dpi": 72, "grayscale": False, "max_dimension": None, "format": "PNG", "quality": None, "text_min_chars": None},
+    "balanced": {"dpi": 110, "grayscale": False, "max_dimension": 1600, "format": "JPEG", "quality": 80, "text_min_chars": 400},
+    "scanned_notes": {"dpi": 150, "grayscale": True, "max_dimension": 2000, "format": "WEBP", "quality": 70, "text_min_chars": None},
+}
 
-api_key = os.getenv("GOOGLE_API_KEY")
+IMAGE_MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
 
-# Configure the generative model with your API key
-genai.configure(api_key=api_key)
-model = genai.GenerativeModel(model_name="gemini-1.5-flash")
+def get_render_profile(name=None):
+    if name is None:
+        name = getattr(settings, "PDF_RENDER_PROFILE", "balanced")
+    return RENDER_PROFILES[name]
 
-# Convert uploaded PDF to images
-def pdf_to_images(pdf_file):
-    # Save the uploaded file to a temporary location
-    temp_pdf_path = "temp.pdf"
-    with open(temp_pdf_path, "wb") as f:
-        f.write(pdf_file.read())
-    
-    # Open the PDF file using PyMuPDF
-    images = []
+# Convert a single fitz page to a PIL image
+def render_page(page, profile=None):
+    profile = profile or RENDER_PROFILES["lossless"]
+    # Render the page as a pixmap (image)
+    colorspace = fitz.csGRAY if profile["grayscale"] else fitz.csRGB
+    pix = page.get_pixmap(dpi=profile["dpi"], colorspace=colorspace)
+    # Convert pixmap to PIL image
+    mode = "L" if profile["grayscale"] else "RGB"
+    img = Image.frombytes(mode, [pix.width, pix.height], pix.samples)
+
+    max_dimension = profile["max_dimension"]
+    if max_dimension and max(img.size) > max_dimension:
+        img.thumbnail((max_dimension, max_dimension))
+    return img
+
+# Decide whether a page can go through the text path or needs the vision model
+def classify_page(page, profile):
+    text_min_chars = profile["text_min_chars"]
+    if not text_min_chars:
+        return "vision", None
+
+    text = page.get_text().strip()
+    if len(text) < text_min_chars:
+        return "vision", None
+
+    # Pages dominated by figures, scans or photos still need to be looked at
+    page_area = abs(page.rect) or 1
+    image_area = sum(abs(fitz.Rect(info["bbox"]) & page.rect) for info in page.get_image_info())
+    max_coverage = getattr(settings, "PDF_TEXT_LAYER_MAX_IMAGE_COVERAGE", 0.25)
+    if image_area / page_area > max_coverage:
+        return "vision", None
+
+    return "text", text
+
+# Build what gets sent to the model for a page: extracted text for text-layer pages, otherwise an encoded image
+def page_payload(page, profile):
+    path, text = classify_page(page, profile)
+    if path == "text":
+        return text
+
+    image = render_page(page, profile)
+    return {
+        "mime_type": IMAGE_MIME_TYPES[profile["format"]],
+        "data": pil_image_to_bytes(image, profile["format"], profile["quality"]),
+    }
+
+# Open an uploaded PDF with PyMuPDF without copying it through a shared file on disk
+def open_pdf_document(pdf_file):
+    # Large uploads are already spooled to disk by Django, let fitz read that file directly
+    if hasattr(pdf_file, "temporary_file_path"):
+        return fitz.open(pdf_file.temporary_file_path())
+
+    pdf_file.seek(0)
+    return fitz.open(stream=pdf_file.read(), filetype="pdf")
+
+# Lazily load only the requested 1-indexed page range of an uploaded PDF
+def iter_pages(pdf_file, start_page, end_page, skip_pages=()):
+    document = open_pdf_document(pdf_file)
     try:
-        document = fitz.open(temp_pdf_path)
-        for page_num in range(len(document)):
-            # Get the page
-            page = document.load_page(page_num)
-            # Render the page as a pixmap (image)
-            pix = page.get_pixmap()
-            # Convert pixmap to PIL image
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            images.append(img)
+        last_page = min(end_page, len(document))
+        for page_num in range(start_page, last_page + 1):
+            if page_num in skip_pages:
+                continue
+            yield page_num, document.load_page(page_num - 1)
     finally:
         # Close the document
         document.close()
-        # Remove the temporary PDF after conversion
-        os.remove(temp_pdf_path)
 
-    return images
+# Lazily render only the requested 1-indexed page range of an uploaded PDF
+def iter_page_images(pdf_file, start_page, end_page, skip_pages=(), profile=None):
+    for page_num, page in iter_pages(pdf_file, start_page, end_page, skip_pages):
+        # Only the pages that are actually requested get rasterized
+        yield page_num, render_page(page, profile)
+
+# Lazily build model payloads for the requested page range using a rendering profile
+def iter_page_payloads(pdf_file, start_page, end_page, skip_pages=(), profile=None):
+    profile = profile or get_render_profile()
+    for page_num, page in iter_pages(pdf_file, start_page, end_page, skip_pages):
+        yield page_num, page_payload(page, profile)
+
+# Convert uploaded PDF to images
+def pdf_to_images(pdf_file):
+    return [image for _, image in iter_page_images(pdf_file, 1, float("inf"))]
 
 # Convert PIL Image to byte array
-def pil_image_to_bytes(image):
+def pil_image_to_bytes(image, image_format="PNG", quality=None):
     img_byte_arr = BytesIO()
-    image.save(img_byte_arr, format='PNG')  # Save as PNG format (can be adjusted as necessary)
+    save_kwargs = {"quality": quality} if quality else {}
+    image.save(img_byte_arr, format=image_format, **save_kwargs)
     img_byte_arr = img_byte_arr.getvalue()  # Get the raw image bytes
     return img_byte_arr
 
-# Vision model inference function
-def vision_model_inference(image):
-    image_bytes = pil_image_to_bytes(image)  # Convert PIL image to bytes
-    response = model.generate_content(
-        ["""You would be given image of notes/textbooks it can be handwritten too so make sure to read
+VISION_PROMPT = """You would be given image of notes/textbooks it can be handwritten too so make sure to read
         the content carefully. There can be handmade diagrams and flowcharts too. Your job is to make 
-        a detailed report or summary by reading which the user can study better.""",
-        image ] # Pass image bytes to the model
-    )
+        a detailed report or summary by reading which the user can study better."""
+
+VISION_PAGES_PROMPT = VISION_PROMPT + """
+        You will be given several pages, each image is preceded by a marker line like "=== Page 3 ===".
+        Write a separate summary for every page, start it with the same marker line of that page
+        and do not merge pages together."""
+
+# Every page model call carries its own deadline, so a hung request fails instead of holding a worker
+def generate_content(model_name, contents):
+    timeout = getattr(settings, "PDF_VISION_TIMEOUT", 120)
+    return get_generative_model(model_name).generate_content(contents, request_options={"timeout": timeout})
+
+# Vision model inference function, accepts a PIL image or an encoded image blob
+def vision_model_inference(image):
+    response = generate_content(VISION_MODEL_NAME, [VISION_PROMPT, image])
     
     return response.text
 
@@ -78,13 +151,177 @@ def process_image_with_vision_model(image):
     text_content = vision_model_inference(image)
     return text_content
 
-def get_vector_store(text_chunks):
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    vector_store = FAISS.from_texts(text_chunks, embedding=embeddings)
-    vector_store.save_local("faiss_index_quiz_summary")
+TEXT_PAGES_PROMPT = """You would be given the extracted text of one or more pages of notes/textbooks. Each page
+starts with a marker line like "=== Page 3 ===". Your job is to make a detailed report or summary of each page
+by reading which the user can study better. Start the summary of every page with the same marker line
+of that page and do not merge pages together."""
 
-def get_conversational_chain():
-    prompt_template = """
+PAGE_MARKER_PATTERN = re.compile(r"^\s*=+\s*Page\s+(\d+)\s*=+\s*$", re.MULTILINE)
+
+# Split a multi-page model response back into {page_num: section} using the page marker lines
+def split_page_sections(text, page_nums):
+    sections = {}
+    markers = list(PAGE_MARKER_PATTERN.finditer(text))
+    for marker, next_marker in zip(markers, markers[1:] + [None]):
+        page_num = int(marker.group(1))
+        end = next_marker.start() if next_marker else len(text)
+        if page_num in page_nums:
+            sections[page_num] = text[marker.end():end].strip()
+    return sections
+
+# Summarize several text-layer pages with a single call to the text model
+def summarize_text_pages(page_texts):
+    prompt = TEXT_PAGES_PROMPT + "\n\n" + "\n\n".join(
+        f"=== Page {page_num} ===\n{text}" for page_num, text in page_texts.items()
+    )
+    response = generate_content(TEXT_MODEL_NAME, prompt)
+    summaries = split_page_sections(response.text, page_texts)
+
+    # Pages the model dropped or merged are retried on their own
+    for page_num, text in page_texts.items():
+        if not summaries.get(page_num):
+            response = generate_content(TEXT_MODEL_NAME, f"{TEXT_PAGES_PROMPT}\n\n=== Page {page_num} ===\n{text}")
+            summaries[page_num] = response.text
+    return summaries
+
+# Summarize several page images with a single call to the vision model
+def summarize_image_pages(page_images):
+    if len(page_images) == 1:
+        [(page_num, image)] = page_images.items()
+        return {page_num: process_image_with_vision_model(image)}
+
+    contents = [VISION_PAGES_PROMPT]
+    for page_num, image in page_images.items():
+        contents += [f"=== Page {page_num} ===", image]
+    response = generate_content(VISION_MODEL_NAME, contents)
+    summaries = split_page_sections(response.text, page_images)
+
+    # Pages the model dropped or merged are retried on their own
+    for page_num, image in page_images.items():
+        if not summaries.get(page_num):
+            summaries[page_num] = process_image_with_vision_model(image)
+    return summaries
+
+def payload_size(payload):
+    if isinstance(payload, str):
+        return len(payload)
+    if isinstance(payload, dict):
+        return len(payload["data"])
+    return 0
+
+# Summarize (page_num, payload) pairs concurrently, keeping page order. Image payloads are packed
+# into vision model calls and text payloads into text model calls, each within its own budget.
+# Returns (summaries, path_counts, failed_pages), pages of a batch that errored or timed out are failed.
+def summarize_pages(pages, max_workers=None, timeout=None, on_progress=None):
+    if max_workers is None:
+        max_workers = getattr(settings, "PDF_VISION_MAX_WORKERS", 4)
+    if timeout is None:
+        timeout = getattr(settings, "PDF_VISION_TIMEOUT", 120)
+    budgets = {
+        "text": (getattr(settings, "PDF_TEXT_BATCH_CHARS", 30000), None),
+        "vision": (getattr(settings, "PDF_VISION_BATCH_BYTES", 4 * 1024 * 1024),
+                   getattr(settings, "PDF_VISION_BATCH_PAGES", 1)),
+    }
+    summarizers = {"text": summarize_text_pages, "vision": summarize_image_pages}
+
+    summaries = {}
+    failed_pages = []
+    path_counts = {"text": 0, "vision": 0}
+    batches = {"text": {}, "vision": {}}
+    batch_sizes = {"text": 0, "vision": 0}
+    in_flight = deque()
+
+    def collect():
+        future, page_nums, deadline = in_flight.popleft()
+        try:
+            done = future.result(timeout=max(0, deadline - time.monotonic()))
+        except Exception as e:
+            logger.warning(f"Summarizing pages {page_nums} failed: {e!r}")
+            failed_pages.extend(page_nums)
+            return
+        summaries.update(done)
+        if on_progress:
+            on_progress(done)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        def flush(path):
+            # Bound the number of rendered pages waiting on the model
+            if len(in_flight) >= max_workers:
+                collect()
+            # The model calls time out on their own, this deadline is a backstop counted from submission.
+            # A multi-page batch may retry each page it dropped, so it is allowed one call per page more.
+            calls = 1 + len(batches[path]) if len(batches[path]) > 1 else 1
+            deadline = time.monotonic() + timeout * calls
+            in_flight.append((executor.submit(summarizers[path], batches[path]), list(batches[path]), deadline))
+            batches[path] = {}
+            batch_sizes[path] = 0
+
+        for page_num, payload in pages:
+            path = "text" if isinstance(payload, str) else "vision"
+            max_size, max_pages = budgets[path]
+            size = payload_size(payload)
+
+            # Start a new batch if this page would push the current one over budget
+            if batches[path] and batch_sizes[path] + size > max_size:
+                flush(path)
+
+            path_counts[path] += 1
+            batches[path][page_num] = payload
+            batch_sizes[path] += size
+            if max_pages and len(batches[path]) >= max_pages:
+                flush(path)
+
+        for path in batches:
+            if batches[path]:
+                flush(path)
+        while in_flight:
+            collect()
+    finally:
+        # Never wait on a call that is stuck past its deadline, and drop work nobody will collect
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return dict(sorted(summaries.items())), path_counts, sorted(failed_pages)
+
+# Number of pages of an uploaded PDF that fall inside a 1-indexed page range
+def count_pages_in_range(pdf_file, start_page, end_page):
+    document = open_pdf_document(pdf_file)
+    try:
+        return max(0, min(end_page, len(document)) - start_page + 1)
+    finally:
+        document.close()
+
+# Summarize a page range, only sending pages that are not cached yet to the models.
+# on_progress, if given, is called with each {page_num: summary} chunk as it becomes available.
+def summarize_pdf(pdf_file, start_page, end_page, on_progress=None):
+    pdf_hash = hash_pdf_file(pdf_file)
+    # end_page comes from the client, only pages the document has are looked up and counted
+    end_page = start_page - 1 + count_pages_in_range(pdf_file, start_page, end_page)
+    cached = get_cached_pages(pdf_hash, range(start_page, end_page + 1))
+    if cached and on_progress:
+        on_progress(cached)
+
+    def page_done(done):
+        # Cache as pages finish so an interrupted request still saves its work
+        cache_pages(pdf_hash, done)
+        if on_progress:
+            on_progress(done)
+
+    fresh, path_counts, failed_pages = summarize_pages(
+        iter_page_payloads(pdf_file, start_page, end_page, skip_pages=cached), on_progress=page_done
+    )
+
+    summaries = {**cached, **fresh}
+    stats = {
+        "cache_hits": len(cached),
+        "cache_misses": len(fresh),
+        "text_pages": path_counts["text"],
+        "vision_pages": path_counts["vision"],
+        "failed_pages": failed_pages,
+    }
+    return dict(sorted(summaries.items())), stats
+
+QUIZ_PROMPT_TEMPLATE = """
     You are a Quiz generator LLM based on the context.
     Answer the question as detailed as possible from the provided context. If the answer is not in
     the provided context, just say, "answer is not available in the context", don't provide a wrong answer.\n\n
@@ -93,18 +330,12 @@ def get_conversational_chain():
 
     Answer:
     """
-    
-    model = ChatGroq(model_name="llama-3.1-70b-versatile", temperature=0.35)
-    prompt = PromptTemplate(template=prompt_template, input_variables=["context", "question"])
-    chain = load_qa_chain(model, chain_type="stuff", prompt=prompt)
-    
-    return chain
 
-def user_input(system_task, user_question):
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    
-    new_db = FAISS.load_local("faiss_index_quiz_summary", embeddings, allow_dangerous_deserialization=True)
-    docs = new_db.similarity_search(user_question)
+def get_conversational_chain():
+    return get_qa_chain(QUIZ_PROMPT_TEMPLATE)
+
+def user_input(system_task, user_question, text_chunks, user):
+    docs = get_context_documents(user, text_chunks, user_question)
 
     chain = get_conversational_chain()
     
@@ -0,0 +1,175 @@
+import json
+import re
+
+MCQ_KEY = "multiple_choice_questions"
+TF_KEY = "true_or_false_questions"
+OPTION_LABELS = ("A", "B", "C", "D")
+
+QUESTION_KEY_PATTERN = re.compile(r"""["']?(question|statement)["']?\s*:""")
+CODE_FENCE_PATTERN = re.compile(r"^```[a-zA-Z]*\s*|\s*```$", re.MULTILINE)
+
+_decoder = json.JSONDecoder()
+
+
+def parse_quiz(text):
+    """Parses an LLM quiz reply into {multiple_choice_questions, true_or_false_questions}.
+
+    Every JSON value in the reply is decoded in turn, so arrays of questions, quizzes split over several
+    objects and example objects in the surrounding prose are all read. When part of the reply is not
+    valid JSON, every question object is located on its own and only the broken ones go through repair,
+    so one bad question never costs the rest of the quiz. Questions are validated against the MCQ and
+    true/false schema and the ones that cannot be repaired are dropped.
+    """
+    text = CODE_FENCE_PATTERN.sub("", text.strip())
+
+    questions, complete = [], True
+    start = text.find("{")
+    while start != -1:
+        try:
+            data, end = _decoder.raw_decode(text, start)
+        except json.JSONDecodeError:
+            complete = False
+            break
+        questions.extend(iter_question_dicts(data))
+        start = text.find("{", end)
+
+    quiz = collect_questions(questions)
+    if not complete or (not quiz[MCQ_KEY] and not quiz[TF_KEY]):
+        quiz = collect_questions(iter_question_objects(text))
+
+    if not quiz[MCQ_KEY] and not quiz[TF_KEY]:
+        raise ValueError("No valid questions could be extracted from the response.")
+    return quiz
+
+
+def collect_questions(questions):
+    """Sorts the valid questions into the quiz schema, dropping the ones normalize_question rejects."""
+    quiz = {MCQ_KEY: [], TF_KEY: []}
+    for question in questions:
+        normalized = normalize_question(question)
+        if normalized is not None:
+            kind, question = normalized
+            quiz[kind].append(question)
+    return quiz
+
+
+def iter_question_dicts(data):
+    """Yields every dict in decoded JSON that looks like a question."""
+    if isinstance(data, dict):
+        if "question" in data or "statement" in data:
+            yield data
+            return
+        data = data.values()
+    if isinstance(data, (list, tuple, type({}.values()))):
+        for item in data:
+            yield from iter_question_dicts(item)
+
+
+def object_spans(text):
+    """Returns the (start, end) span of every {...} in text, skipping braces inside double-quoted strings."""
+    spans, stack = [], []
+    in_string = escaped = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            stack.append(index)
+        elif char == "}" and stack:
+            spans.append((stack.pop(), index + 1))
+    return spans
+
+
+def iter_question_objects(text):
+    """Decodes each question object of a broken reply on its own, repairing only those that need it."""
+    spans = [span for span in object_spans(text) if QUESTION_KEY_PATTERN.search(text, span[0], span[1])]
+    for start, end in spans:
+        # Containers of questions also mention the keys, keep only the innermost question objects
+        if any(other != (start, end) and start <= other[0] and other[1] <= end for other in spans):
+            continue
+        raw = text[start:end]
+        try:
+            yield json.loads(raw)
+        except json.JSONDecodeError:
+            repaired = repair_object(raw)
+            if repaired is not None:
+                yield repaired
+
+
+def repair_object(raw):
+    """Applies the usual LLM JSON fixes to a single object, returns None if it still does not parse."""
+    fixes = (
+        lambda s: re.sub(r"^\s*//.*$", "", s, flags=re.MULTILINE),
+        lambda s: re.sub(r",\s*([\]}])", r"\1", s),
+        lambda s: re.sub(r"(?<=[:\[,\s])(True|False|None)(?=\s*[,}\]])",
+                         lambda m: {"True": "true", "False": "false", "None": "null"}[m.group(1)], s),
+        lambda s: re.sub(r"([{,]\s*)([A-Za-z_]\w*)(\s*:)", r'\1"\2"\3', s),
+        lambda s: re.sub(r"(?<=[\s{\[,:])'((?:[^'\\\n]|\\.)*)'(?=\s*[:,}\]])",
+                         lambda m: json.dumps(m.group(1)), s),
+    )
+    for fix in fixes:
+        raw = fix(raw)
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def normalize_question(question):
+    """Validates a question against the quiz schema, returns (kind, question) or None if it is unusable."""
+    if not isinstance(question, dict):
+        return None
+
+    options = question.get("options")
+    correct = question.get("correct_option", question.get("answer"))
+    if isinstance(correct, bool):
+        correct = "True" if correct else "False"
+    correct = str(correct).strip() if correct is not None else ""
+    if correct.lower() in ("true", "false"):
+        correct = correct.capitalize()
+
+    if "statement" in question:
+        is_true_false = True
+    elif correct in ("True", "False"):
+        labels = options if isinstance(options, dict) else options or []
+        is_true_false = {str(label).strip().lower() for label in labels} <= {"true", "false"}
+    else:
+        is_true_false = False
+    if is_true_false:
+        statement = str(question.get("statement") or question.get("question") or "").strip()
+        if not statement or correct not in ("True", "False"):
+            return None
+        return TF_KEY, {
+            "statement": statement,
+            "options": {"True": "True", "False": "False"},
+            "correct_option": correct,
+        }
+
+    text = str(question.get("question") or "").strip()
+    if isinstance(options, list):
+        options = dict(zip(OPTION_LABELS, options))
+    if not text or not isinstance(options, dict):
+        return None
+    options = {str(label).strip().upper()[:1]: str(value).strip() for label, value in options.items()}
+    if set(options) != set(OPTION_LABELS) or not all(options.values()):
+        return None
+
+    # Accept the option text itself, "B", "B) text" or "(B)" as the answer. The text is matched first so
+    # an option that starts with a letter and a space, like "A priori", is not read as a label
+    matches = [label for label, value in options.items() if value.lower() == correct.lower()]
+    label = correct.strip("() ").upper()
+    if matches:
+        correct = matches[0]
+    elif label[:1] in options and not label[1:2].isalnum():
+        correct = label[:1]
+    else:
+        return None
+
+    return MCQ_KEY, {"question": text, "options": options, "correct_option": correct}
@@ -1,12 +1,18 @@
 from rest_framework import serializers
-from .models import YouTubeSummary,PDFSummary,PDFMindMap,GeneratedQuiz
+from .models import YouTubeSummary,PDFSummary,PDFMindMap,GeneratedQuiz,PDFSummaryJob
 
 class YouTubeSummarySerializer(serializers.ModelSerializer):
+    transcript = serializers.SerializerMethodField()
+
     class Meta:
         model = YouTubeSummary
         fields = ['id', 'user', 'youtube_url', 'transcript', 'summary', 'created_at']
         read_only_fields = ['id', 'user', 'transcript', 'summary', 'created_at']
 
+    def get_transcript(self, obj):
+        # Summaries that were not backfilled yet still carry their own copy
+        return obj.shared_transcript.text if obj.shared_transcript else obj.transcript
+
     # Validate the YouTube URL
     def validate_youtube_url(self, value):
         if "youtube.com" not in value and "youtu.be" not in value:
@@ -26,11 +32,34 @@ class PDFSummarySerializer(serializers.ModelSerializer):
 
 
 
+class PDFSummaryJobSerializer(serializers.ModelSerializer):
+    completed_pages = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PDFSummaryJob
+        fields = ['id', 'status', 'start_page_number', 'end_page_number', 'total_pages', 'completed_pages',
+                  'page_summaries', 'page_stats', 'error', 'pdf_summary', 'created_at', 'updated_at']
+
+    def get_completed_pages(self, obj):
+        return len(obj.page_summaries)
+
 
 class PDFMindMapSerializer(serializers.ModelSerializer):
     class Meta:
         model = PDFMindMap
-        fields = ['id', 'user', 'pdf_file', 'start_page_number', 'end_page_number', 'mindmap_json', 'created_at']
+        fields = ['id', 'user', 'pdf_file', 'content_hash', 'mindmap_json', 'created_at']
+
+
+class PDFMindMapListSerializer(serializers.ModelSerializer):
+    title = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PDFMindMap
+        fields = ['id', 'pdf_file', 'title', 'created_at']
+
+    def get_title(self, obj):
+        return obj.mindmap_json.get('title', '') if isinstance(obj.mindmap_json, dict) else ''
+
         
         
 class GeneratedQuizSerializer(serializers.ModelSerializer):
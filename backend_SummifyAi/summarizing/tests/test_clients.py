@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+import httpx
+from django.test import SimpleTestCase, tag
+from summarizing import clients
+from .utils import report
+
+
+class ClientRegistryTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(clients._registry, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_factory_runs_once_across_threads(self):
+        calls = []
+
+        def factory():
+            calls.append(1)
+            time.sleep(0.01)
+            return object()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: clients.get_or_create("client", factory), range(32)))
+
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    @mock.patch.dict(os.environ, {"GROQ_API_KEY": "test-key"})
+    def test_chains_are_shared_per_prompt(self):
+        first = clients.get_qa_chain("Context: {context}\nQuestion: {question}")
+        self.assertIs(clients.get_qa_chain("Context: {context}\nQuestion: {question}"), first)
+        self.assertIsNot(clients.get_qa_chain("{context} / {question}"), first)
+        self.assertIs(first.llm_chain.llm, clients.get_chat_model())
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = b'{"choices": [{"message": {"content": "ok"}}]}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@tag("benchmark")
+class ClientRegistryBenchmark(SimpleTestCase):
+    REQUESTS = 200
+
+    def setUp(self):
+        patcher = mock.patch.dict(clients._registry, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_shared_connection_pool_against_a_local_stub_server(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubLLMHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_port}/v1/chat/completions"
+
+        # What building a client per call did: a new connection pool, and a new connection, every request
+        started = time.perf_counter()
+        for _ in range(self.REQUESTS):
+            with httpx.Client() as client:
+                client.post(url, json={"messages": []})
+        per_call = (time.perf_counter() - started) / self.REQUESTS
+
+        started = time.perf_counter()
+        for _ in range(self.REQUESTS):
+            clients.get_http_client().post(url, json={"messages": []})
+        shared = (time.perf_counter() - started) / self.REQUESTS
+
+        # Plain HTTP on localhost, so the TLS handshakes saved against the real APIs are not even counted
+        report("LLM HTTP request overhead, local stub server", per_call_client_ms=per_call * 1000, shared_client_ms=shared * 1000)
+
+    @mock.patch.dict(os.environ, {"GROQ_API_KEY": "test-key"})
+    def test_chain_construction_per_request(self):
+        from langchain.chains.question_answering import load_qa_chain
+        from langchain.prompts import PromptTemplate
+        from langchain_groq import ChatGroq
+
+        template = "Context: {context}\nQuestion: {question}"
+        started = time.perf_counter()
+        for _ in range(50):
+            model = ChatGroq(model_name="llama-3.1-70b-versatile", temperature=0.35)
+            load_qa_chain(model, chain_type="stuff", prompt=PromptTemplate(template=template, input_variables=["context", "question"]))
+        per_call = (time.perf_counter() - started) / 50
+
+        clients.get_qa_chain(template)
+        started = time.perf_counter()
+        for _ in range(50):
+            clients.get_qa_chain(template)
+        shared = (time.perf_counter() - started) / 50
+
+        report("QA chain per request", constructed_ms=per_call * 1000, registry_ms=shared * 1000)
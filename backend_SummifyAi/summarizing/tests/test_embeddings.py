@@ -0,0 +1,123 @@
+import time
+import numpy as np
+from django.test import SimpleTestCase, TestCase, tag
+from summarizing.embeddings import CachedEmbeddings, HashingEmbeddings
+from summarizing.models import EmbeddingCacheEntry
+from .utils import report
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(text)), 0.5] for text in texts]
+
+    def embed_query(self, text):
+        self.batches.append([text])
+        return [float(len(text)), 1.0]
+
+
+class CachedEmbeddingsTests(TestCase):
+    def test_stats_separate_cache_hits_from_repeats(self):
+        embedder = CountingEmbedder()
+        cached = CachedEmbeddings(embedder, "fake-model", batch_size=10)
+
+        vectors = cached.embed_documents(["alpha", "alpha", "beta"])
+        self.assertEqual(vectors, [[5.0, 0.5], [5.0, 0.5], [4.0, 0.5]])
+        self.assertEqual(cached.stats, {"cached": 0, "embedded": 2, "deduplicated": 1, "calls": 1})
+
+        cached.embed_documents(["alpha", "gamma", "gamma"])
+        self.assertEqual(cached.stats, {"cached": 1, "embedded": 3, "deduplicated": 2, "calls": 2})
+        self.assertEqual(embedder.batches, [["alpha", "beta"], ["gamma"]])
+
+    def test_misses_are_sent_in_bounded_batches_and_stored_as_float32(self):
+        embedder = CountingEmbedder()
+        cached = CachedEmbeddings(embedder, "fake-model", batch_size=2)
+
+        cached.embed_documents([f"chunk {index}" for index in range(5)])
+
+        self.assertEqual([len(batch) for batch in embedder.batches], [2, 2, 1])
+        self.assertEqual(len(EmbeddingCacheEntry.objects.first().vector), 2 * 4)
+
+
+# Fixed retrieval corpus: every query should retrieve the document with the same key
+RETRIEVAL_CORPUS = {
+    "arima": "ARIMA models predict a time series from differenced values, autoregressive terms and moving average residuals.",
+    "unit_root": "A time series has a unit root when phi equals one, which makes the series non-stationary with growing variance.",
+    "photosynthesis": "Photosynthesis in chloroplasts converts light energy, water and carbon dioxide into glucose and oxygen.",
+    "mitosis": "Mitosis divides one cell nucleus into two identical nuclei through prophase, metaphase, anaphase and telophase.",
+    "ohm": "Ohm's law states that the current through a resistor equals the voltage across it divided by its resistance.",
+    "newton": "Newton's second law says the net force on a body equals its mass multiplied by its acceleration.",
+    "supply_demand": "Market price settles where the supply curve of producers crosses the demand curve of consumers.",
+    "recursion": "A recursive function calls itself on a smaller input until it reaches a base case that stops the recursion.",
+    "french_revolution": "The French Revolution began in 1789 with the storming of the Bastille and ended the absolute monarchy.",
+    "enzymes": "Enzymes are proteins that lower the activation energy of reactions and bind substrates at their active site.",
+}
+RETRIEVAL_QUERIES = {
+    "arima": "how does an ARIMA model use differencing and moving average terms",
+    "unit_root": "when is a series with a unit root non-stationary",
+    "photosynthesis": "what does photosynthesis turn light energy into",
+    "mitosis": "phases of mitosis in a cell nucleus",
+    "ohm": "relation between voltage, current and resistance",
+    "newton": "force equals mass times acceleration",
+    "supply_demand": "where do the supply and demand curves set the market price",
+    "recursion": "base case of a recursive function",
+    "french_revolution": "what happened at the Bastille in 1789",
+    "enzymes": "how enzymes lower activation energy",
+}
+
+
+class HashingEmbeddingsTests(SimpleTestCase):
+    def test_vectors_are_stable_and_normalized(self):
+        embeddings = HashingEmbeddings(dim=64)
+        first, second = embeddings.embed_documents(["unit roots and stationarity", "unit roots and stationarity"])
+        self.assertEqual(first, second)
+        self.assertEqual(len(first), 64)
+        self.assertAlmostEqual(sum(value * value for value in first), 1.0, places=5)
+        self.assertEqual(embeddings.embed_documents([""])[0], [0.0] * 64)
+
+    def test_fixed_corpus_retrieval(self):
+        self.assertGreaterEqual(top1_accuracy(HashingEmbeddings()), 0.9)
+
+
+def top1_accuracy(embeddings):
+    keys = list(RETRIEVAL_CORPUS)
+    documents = np.array(embeddings.embed_documents([RETRIEVAL_CORPUS[key] for key in keys]))
+    correct = 0
+    for key, query in RETRIEVAL_QUERIES.items():
+        scores = documents @ np.array(embeddings.embed_query(query))
+        correct += keys[int(np.argmax(scores))] == key
+    return correct / len(RETRIEVAL_QUERIES)
+
+
+class StubRemoteEmbedder:
+    """Stands in for GoogleGenerativeAIEmbeddings: one network round-trip per batch, no meaningful vectors."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency)
+        return [[1.0] * 768 for _ in texts]
+
+
+@tag("benchmark")
+class EmbeddingProviderBenchmark(TestCase):
+    def test_chunks_per_second_and_retrieval_quality(self):
+        chunks = [f"{text} Section {index}." for index in range(100) for text in RETRIEVAL_CORPUS.values()]
+
+        started = time.perf_counter()
+        HashingEmbeddings().embed_documents(chunks)
+        local_rate = len(chunks) / (time.perf_counter() - started)
+
+        # The remote provider behind the embedding cache, cold, with a 150ms round-trip per batch of 100
+        remote = CachedEmbeddings(StubRemoteEmbedder(latency=0.15), "stub-remote", batch_size=100)
+        started = time.perf_counter()
+        remote.embed_documents(chunks)
+        remote_rate = len(chunks) / (time.perf_counter() - started)
+
+        accuracy = top1_accuracy(HashingEmbeddings())
+        report("embedding providers, 1000 chunks", local_chunks_per_sec=local_rate,
+               stub_remote_chunks_per_sec=remote_rate, local_top1_accuracy=accuracy)
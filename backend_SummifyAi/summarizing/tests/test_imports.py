@@ -0,0 +1,45 @@
+from django.test import SimpleTestCase, tag
+from .utils import report, run_in_subprocess
+
+# SDKs that must only be imported when a model, chain or index is first used
+HEAVY_MODULES = ("langchain", "langchain_core", "langchain_community", "langchain_groq", "langchain_google_genai",
+                 "langchain_text_splitters", "google.generativeai", "faiss", "groq")
+
+IMPORT_VIEWS = """
+started = time.perf_counter()
+import summarizing.views
+import summarizing.urls
+seconds = time.perf_counter() - started
+heavy = sorted(name for name in sys.modules if name in HEAVY_MODULES or name.startswith(tuple(prefix + "." for prefix in HEAVY_MODULES)))
+print(json.dumps({"seconds": seconds, "heavy": heavy}))
+"""
+
+# What importing the views cost before the SDKs were loaded lazily
+IMPORT_VIEWS_WITH_SDKS = """
+started = time.perf_counter()
+import google.generativeai
+import langchain_google_genai
+import langchain_groq
+from langchain.chains.question_answering import load_qa_chain
+from langchain_community.vectorstores import FAISS
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+import summarizing.views
+import summarizing.urls
+print(json.dumps({"seconds": time.perf_counter() - started}))
+"""
+
+
+class LazyImportTests(SimpleTestCase):
+    def test_importing_the_views_loads_no_sdk(self):
+        result = run_in_subprocess(f"HEAVY_MODULES = {HEAVY_MODULES!r}\n" + IMPORT_VIEWS)
+        self.assertEqual(result["heavy"], [])
+
+
+@tag("benchmark")
+class ImportTimeBenchmark(SimpleTestCase):
+    def test_views_import_time(self):
+        runs = 3
+        lazy = min(run_in_subprocess(f"HEAVY_MODULES = {HEAVY_MODULES!r}\n" + IMPORT_VIEWS)["seconds"] for _ in range(runs))
+        eager = min(run_in_subprocess(IMPORT_VIEWS_WITH_SDKS)["seconds"] for _ in range(runs))
+
+        report("summarizing.views import, best of 3", lazy_seconds=lazy, with_sdks_seconds=eager)
@@ -0,0 +1,158 @@
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from user_profile.models import UserStatistics
+from summarizing import jobs, page_cache
+from summarizing.models import PDFSummary, PDFSummaryJob
+from .utils import MediaRootTestCase, make_pdf, make_upload
+
+
+class StaleJobRecoveryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("student", password="secret")
+        self.executor = mock.Mock()
+        patcher = mock.patch.object(jobs, "get_executor", return_value=self.executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def job(self, status, age):
+        job = PDFSummaryJob.objects.create(
+            user=self.user, pdf_file="pdfs/notes.pdf", start_page_number=1, end_page_number=2, status=status
+        )
+        PDFSummaryJob.objects.filter(id=job.id).update(updated_at=timezone.now() - age)
+        return job
+
+    def test_orphaned_jobs_are_requeued(self):
+        pending = self.job('pending', timedelta(hours=2))
+        running = self.job('running', timedelta(hours=2))
+
+        with self.settings(PDF_JOB_STALE_AFTER=60 * 60):
+            requeued = jobs.recover_stale_jobs()
+
+        self.assertCountEqual(requeued, [pending.id, running.id])
+        self.assertEqual(self.executor.submit.call_count, 2)
+        running.refresh_from_db()
+        self.assertEqual(running.status, 'pending')
+        self.assertGreater(running.updated_at, timezone.now() - timedelta(minutes=1))
+
+    def test_live_and_finished_jobs_are_left_alone(self):
+        self.job('running', timedelta(minutes=5))
+        self.job('completed', timedelta(hours=2))
+        self.job('failed', timedelta(hours=2))
+
+        with self.settings(PDF_JOB_STALE_AFTER=60 * 60):
+            self.assertEqual(jobs.recover_stale_jobs(), [])
+        self.executor.submit.assert_not_called()
+
+    def test_a_job_is_only_claimed_once(self):
+        self.job('running', timedelta(hours=2))
+
+        with self.settings(PDF_JOB_STALE_AFTER=60 * 60):
+            jobs.recover_stale_jobs()
+            # Another worker process running the recovery afterwards finds nothing left to claim
+            self.assertEqual(jobs.recover_stale_jobs(), [])
+        self.assertEqual(self.executor.submit.call_count, 1)
+
+
+@override_settings(PDF_PAGE_CACHE_ALIAS="default")
+class PDFSummaryJobTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        page_cache.get_cache().clear()
+        UserStatistics.objects.create(user=self.user)
+        self.executor = mock.Mock()
+        for patcher in (mock.patch.object(jobs, "get_executor", return_value=self.executor),
+                        mock.patch.object(jobs, "schedule_quiz_pool")):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def submit(self, page_count=3, start_page=1, end_page=3):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("pdf_summary_job_create"), {
+                "pdf_file": make_upload(make_pdf(page_count)), "start_page_number": start_page, "end_page_number": end_page,
+            }, format="multipart")
+        return response
+
+    def run_job(self, job_id, summarize_pages):
+        with mock.patch("summarizing.pdf_summarizer.summarize_pages", summarize_pages):
+            jobs.run_pdf_summary_job(job_id)
+        return PDFSummaryJob.objects.get(id=job_id)
+
+    def test_submission_returns_the_job_right_away(self):
+        response = self.submit()
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["status"], "pending")
+        job = PDFSummaryJob.objects.get(id=response.data["job_id"])
+        self.assertEqual((job.user, job.start_page_number, job.end_page_number), (self.user, 1, 3))
+        self.assertTrue(job.pdf_file.storage.exists(job.pdf_file.name))
+        self.executor.submit.assert_called_once_with(jobs.run_pdf_summary_job, job.id)
+
+    def test_invalid_page_range_is_rejected(self):
+        response = self.submit(start_page=3, end_page=1)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PDFSummaryJob.objects.exists())
+
+    def test_job_reports_progress_and_saves_the_summary(self):
+        job_id = self.submit().data["job_id"]
+        progress = []
+
+        def summarize_pages(pages, on_progress=None):
+            summaries = {}
+            for page_num, _ in pages:
+                summaries[page_num] = f"summary of page {page_num}"
+                on_progress({page_num: summaries[page_num]})
+                job = PDFSummaryJob.objects.get(id=job_id)
+                progress.append((job.status, job.total_pages, sorted(job.page_summaries)))
+            return summaries, {"text": len(summaries), "vision": 0}, []
+
+        job = self.run_job(job_id, summarize_pages)
+
+        self.assertEqual(progress, [("running", 3, ["1"]), ("running", 3, ["1", "2"]), ("running", 3, ["1", "2", "3"])])
+        self.assertEqual(job.status, "completed")
+        self.assertEqual(job.page_stats["cache_misses"], 3)
+        self.assertEqual(job.pdf_summary.summary, "\n".join(f"Page {num}: summary of page {num}" for num in (1, 2, 3)))
+        self.assertEqual(job.pdf_summary.pdf_file.name, job.pdf_file.name)
+        self.assertEqual(UserStatistics.objects.get(user=self.user).pdfs_summarized, 1)
+
+    def test_job_fails_when_no_page_was_summarized(self):
+        job_id = self.submit().data["job_id"]
+
+        def summarize_pages(pages, on_progress=None):
+            return {}, {"text": 0, "vision": 3}, [page_num for page_num, _ in pages]
+
+        with self.assertLogs("summarizing.jobs", "ERROR"):
+            job = self.run_job(job_id, summarize_pages)
+
+        self.assertEqual(job.status, "failed")
+        self.assertIn("[1, 2, 3]", job.error)
+        self.assertFalse(PDFSummary.objects.exists())
+        self.assertEqual(UserStatistics.objects.get(user=self.user).pdfs_summarized, 0)
+
+    def test_job_fails_on_a_model_error(self):
+        job_id = self.submit().data["job_id"]
+
+        with self.assertLogs("summarizing.jobs", "ERROR"):
+            job = self.run_job(job_id, mock.Mock(side_effect=RuntimeError("quota exceeded")))
+
+        self.assertEqual((job.status, job.error), ("failed", "quota exceeded"))
+
+    def test_detail_only_returns_pages_after_the_given_one(self):
+        job = PDFSummaryJob.objects.create(user=self.user, pdf_file="pdfs/notes.pdf", start_page_number=1, end_page_number=3,
+                                           status="running", total_pages=3, page_summaries={"1": "a", "2": "b", "3": "c"})
+        url = reverse("pdf_summary_job_detail", args=[job.id])
+
+        response = self.client.get(url, {"after": 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["page_summaries"], {"2": "b", "3": "c"})
+        self.assertEqual(response.data["completed_pages"], 3)
+        self.assertEqual(self.client.get(url).data["page_summaries"], {"1": "a", "2": "b", "3": "c"})
+        self.assertEqual(self.client.get(url, {"after": "two"}).status_code, 400)
+
+    def test_other_users_jobs_are_not_found(self):
+        other = User.objects.create_user("other", password="secret")
+        job = PDFSummaryJob.objects.create(user=other, pdf_file="pdfs/notes.pdf", start_page_number=1, end_page_number=1)
+        self.assertEqual(self.client.get(reverse("pdf_summary_job_detail", args=[job.id])).status_code, 404)
@@ -0,0 +1,37 @@
+import gc
+import threading
+import time
+from django.test import SimpleTestCase
+from summarizing import locks
+
+
+class KeyLockTests(SimpleTestCase):
+    def test_same_key_is_mutually_exclusive(self):
+        inside, overlaps = [], []
+
+        def work():
+            with locks.key_lock("video:abc"):
+                if inside:
+                    overlaps.append(True)
+                inside.append(True)
+                time.sleep(0.01)
+                inside.pop()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(overlaps, [])
+
+    def test_held_lock_is_shared_and_released_locks_are_dropped(self):
+        with locks.key_lock("upload:a") as held:
+            self.assertIs(locks.key_lock("upload:a"), held)
+            self.assertFalse(locks.key_lock("upload:a").acquire(blocking=False))
+        del held
+
+        for index in range(1000):
+            with locks.key_lock(f"upload:{index}"):
+                pass
+        gc.collect()
+        self.assertEqual([key for key in locks._locks if key.startswith("upload:")], [])
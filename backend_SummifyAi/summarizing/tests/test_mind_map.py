@@ -0,0 +1,126 @@
+import json
+import tempfile
+import time
+from unittest import mock
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings, tag
+from summarizing import mind_map
+from .utils import make_pdf, report, run_in_subprocess
+
+
+def outline_reply(title, *topics):
+    return json.dumps({"title": title, "nodes": [{"text": topic, "nodes": [{"text": f"{topic} detail"}]} for topic in topics]})
+
+
+class StubChain:
+    """Answers every outline request with the reply registered for the chunk text."""
+
+    def __init__(self, replies):
+        self.replies = replies
+        self.calls = 0
+
+    def __call__(self, inputs, return_only_outputs=True):
+        self.calls += 1
+        return {"output_text": self.replies[inputs["input_documents"][0].page_content]}
+
+
+@override_settings(MINDMAP_MODE="hierarchical", MINDMAP_OUTLINE_CACHE_ALIAS="default")
+class HierarchicalMindmapTests(SimpleTestCase):
+    def setUp(self):
+        caches["default"].clear()
+
+    def generate(self, chain, chunks):
+        with mock.patch.object(mind_map, "get_conversational_chain", return_value=chain):
+            return mind_map.generate_mindmap(chunks, user=None)
+
+    def test_outlines_merge_into_one_numbered_tree(self):
+        chain = StubChain({
+            "part one": outline_reply("Time Series", "ARIMA", "Unit Roots"),
+            "part two": outline_reply("", "unit roots", "Stationarity"),
+        })
+        mindmap = self.generate(chain, ["part one", "part two"])
+
+        self.assertEqual(mindmap["title"], "Time Series")
+        self.assertEqual([node["text"] for node in mindmap["nodes"]], ["ARIMA", "Unit Roots", "Stationarity"])
+        self.assertEqual(mindmap["nodes"][1]["nodes"], [{"id": "2.1", "text": "Unit Roots detail"}])
+
+    def test_unparseable_outline_is_left_out_and_not_cached(self):
+        chain = StubChain({"part one": outline_reply("Notes", "ARIMA"), "part two": "Sorry, I cannot help with that."})
+        with self.assertLogs("summarizing.mind_map", "WARNING"):
+            mindmap = self.generate(chain, ["part one", "part two"])
+        self.assertEqual([node["text"] for node in mindmap["nodes"]], ["ARIMA"])
+
+        # The parsed outline comes from the cache, the broken one is asked for again
+        chain.replies["part two"] = outline_reply("", "Stationarity")
+        mindmap = self.generate(chain, ["part one", "part two"])
+        self.assertEqual(chain.calls, 3)
+        self.assertEqual([node["text"] for node in mindmap["nodes"]], ["ARIMA", "Stationarity"])
+
+    def test_pdf_without_text_raises(self):
+        with self.assertRaises(ValueError):
+            self.generate(StubChain({}), [])
+
+    def test_no_usable_outline_raises(self):
+        with self.assertLogs("summarizing.mind_map", "WARNING"), self.assertRaises(ValueError):
+            self.generate(StubChain({"scan": "not json"}), ["scan"])
+
+    @override_settings(MINDMAP_MAX_WORKERS=2)
+    def test_chunks_are_read_only_as_fast_as_they_are_outlined(self):
+        read, outlined, max_ahead = [0], [0], [0]
+
+        def chunks():
+            for index in range(40):
+                read[0] += 1
+                max_ahead[0] = max(max_ahead[0], read[0] - outlined[0])
+                yield f"part {index}"
+
+        def outline_chunk(chunk):
+            time.sleep(0.002)
+            outlined[0] += 1
+            return {"title": "", "nodes": [{"text": chunk}]}
+
+        with mock.patch.object(mind_map, "outline_chunk", outline_chunk):
+            mindmap = mind_map.generate_hierarchical_mindmap(chunks())
+
+        self.assertEqual([node["text"] for node in mindmap["nodes"]], [f"part {index}" for index in range(40)])
+        # Two workers with one chunk queued behind each, plus the chunk being read
+        self.assertLessEqual(max_ahead[0], 2 * 2 + 1)
+
+
+@tag("benchmark")
+class PDFTextExtractionBenchmark(SimpleTestCase):
+    # What get_pdf_text used to do: PyPDF2 with quadratic string concatenation, then chunking the whole text
+    CONCATENATED = """
+from PyPDF2 import PdfReader
+from summarizing.mind_map import get_text_chunks
+started = time.perf_counter()
+text = ""
+for page in PdfReader(PDF_PATH).pages:
+    text += page.extract_text()
+chunk_count = len(get_text_chunks(text))
+"""
+    STREAMED = """
+from summarizing.mind_map import iter_pdf_page_texts, iter_text_chunks
+from summarizing.tests.utils import make_upload
+started = time.perf_counter()
+with open(PDF_PATH, "rb") as f:
+    upload = make_upload(f.read())
+# Chunks are consumed one at a time, as the outline executor reads them
+chunk_count = sum(1 for _ in iter_text_chunks(iter_pdf_page_texts(upload)))
+"""
+    MEASURE = """
+print(json.dumps({"seconds": time.perf_counter() - started, "peak_rss_mb": peak_rss_mb(), "chunks": chunk_count}))
+"""
+
+    def test_streamed_extraction_of_a_large_pdf(self):
+        results = {}
+        with tempfile.NamedTemporaryFile(suffix=".pdf") as pdf:
+            for page_count in (250, 1000):
+                pdf.seek(0)
+                pdf.truncate()
+                pdf.write(make_pdf(page_count, lines_per_page=60))
+                pdf.flush()
+                for name, body in (("concatenated", self.CONCATENATED), ("streamed", self.STREAMED)):
+                    results[name, page_count] = run_in_subprocess(f"PDF_PATH = {pdf.name!r}\n" + body + self.MEASURE)
+                    report(f"mind map text extraction, {page_count} pages, {name}", **results[name, page_count])
+
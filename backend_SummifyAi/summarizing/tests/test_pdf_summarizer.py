@@ -0,0 +1,377 @@
+import tempfile
+import threading
+import time
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import fitz
+from PIL import Image, ImageFilter
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.test import SimpleTestCase, override_settings, tag
+from summarizing import page_cache, pdf_summarizer
+from .utils import make_pdf, make_upload, report, run_in_subprocess
+
+
+class PageRangeRenderingTests(SimpleTestCase):
+    def test_only_requested_pages_are_rendered(self):
+        upload = make_upload(make_pdf(20))
+        with mock.patch.object(pdf_summarizer, "render_page", wraps=pdf_summarizer.render_page) as render_page:
+            pages = [page_num for page_num, _ in pdf_summarizer.iter_page_images(upload, 12, 15)]
+
+        self.assertEqual(pages, [12, 13, 14, 15])
+        self.assertEqual(render_page.call_count, 4)
+
+    def test_range_past_the_last_page_is_clamped(self):
+        upload = make_upload(make_pdf(3))
+        pages = [page_num for page_num, _ in pdf_summarizer.iter_page_images(upload, 2, 10)]
+        self.assertEqual(pages, [2, 3])
+
+
+@tag("benchmark")
+class PageRangeRenderingBenchmark(SimpleTestCase):
+    # What pdf_to_images used to do: rasterize the whole document, then keep only the requested slice
+    FULL_DOCUMENT = """
+import fitz
+from summarizing.pdf_summarizer import render_page
+started = time.perf_counter()
+document = fitz.open(PDF_PATH)
+images = [render_page(page) for page in document][START - 1:END]
+"""
+    PAGE_RANGE = """
+from summarizing.pdf_summarizer import iter_page_images
+from summarizing.tests.utils import make_upload
+started = time.perf_counter()
+with open(PDF_PATH, "rb") as f:
+    images = [image for _, image in iter_page_images(make_upload(f.read()), START, END)]
+"""
+    MEASURE = """
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "peak_rss_mb": peak_rss_mb(), "images": len(images)}))
+"""
+
+    def measure(self, body, path):
+        setup = f"PDF_PATH = {path!r}\nSTART, END = 12, 15\n"
+        return run_in_subprocess(setup + body + self.MEASURE)
+
+    def test_page_range_vs_full_document(self):
+        with tempfile.NamedTemporaryFile(suffix=".pdf") as pdf:
+            pdf.write(make_pdf(150))
+            pdf.flush()
+            full = self.measure(self.FULL_DOCUMENT, pdf.name)
+            page_range = self.measure(self.PAGE_RANGE, pdf.name)
+
+        report("pdf_to_images, 150 pages", **{f"full_{k}": v for k, v in full.items()}, **{f"range_{k}": v for k, v in page_range.items()})
+        self.assertEqual(full["images"], page_range["images"])
+
+
+def image_pages(count):
+    return [(page_num, {"mime_type": "image/png", "data": f"page {page_num}".encode()}) for page_num in range(1, count + 1)]
+
+
+def slow_vision_model(latency, slow_pages=(), slow_latency=0):
+    """Stub for vision_model_inference that answers with the page it was given after some latency."""
+    def inference(image):
+        page = image["data"].decode()
+        time.sleep(slow_latency if int(page.split()[1]) in slow_pages else latency)
+        return f"summary of {page}"
+    return inference
+
+
+class ConcurrentPageSummaryTests(SimpleTestCase):
+    def test_pages_come_back_in_page_order(self):
+        with mock.patch.object(pdf_summarizer, "vision_model_inference", slow_vision_model(0.01)):
+            summaries, path_counts, failed_pages = pdf_summarizer.summarize_pages(image_pages(6), max_workers=3)
+
+        self.assertEqual(list(summaries), [1, 2, 3, 4, 5, 6])
+        self.assertEqual(summaries[4], "summary of page 4")
+        self.assertEqual(path_counts, {"text": 0, "vision": 6})
+        self.assertEqual(failed_pages, [])
+
+    def test_hung_call_fails_its_page_without_waiting_for_it(self):
+        inference = slow_vision_model(0.01, slow_pages={2}, slow_latency=2)
+        with mock.patch.object(pdf_summarizer, "vision_model_inference", inference), \
+                self.assertLogs("summarizing.pdf_summarizer", "WARNING"):
+            started = time.perf_counter()
+            summaries, _, failed_pages = pdf_summarizer.summarize_pages(image_pages(4), max_workers=4, timeout=0.3)
+            elapsed = time.perf_counter() - started
+
+        self.assertLess(elapsed, 1)
+        self.assertEqual(failed_pages, [2])
+        self.assertEqual(list(summaries), [1, 3, 4])
+
+    def test_model_error_fails_its_page(self):
+        def inference(image):
+            if image["data"] == b"page 3":
+                raise RuntimeError("quota exceeded")
+            return "ok"
+
+        with mock.patch.object(pdf_summarizer, "vision_model_inference", inference), \
+                self.assertLogs("summarizing.pdf_summarizer", "WARNING") as logs:
+            summaries, _, failed_pages = pdf_summarizer.summarize_pages(image_pages(4), max_workers=2)
+
+        self.assertEqual(failed_pages, [3])
+        self.assertEqual(list(summaries), [1, 2, 4])
+        self.assertIn("quota exceeded", logs.output[0])
+
+    def test_model_calls_carry_the_timeout(self):
+        model = mock.Mock()
+        with mock.patch.object(pdf_summarizer, "get_generative_model", return_value=model), \
+                self.settings(PDF_VISION_TIMEOUT=7):
+            pdf_summarizer.vision_model_inference("image")
+
+        self.assertEqual(model.generate_content.call_args.kwargs["request_options"], {"timeout": 7})
+
+
+@tag("benchmark")
+class ConcurrentPageSummaryBenchmark(SimpleTestCase):
+    def test_concurrent_vs_serial_pages(self):
+        timings = {}
+        with mock.patch.object(pdf_summarizer, "vision_model_inference", slow_vision_model(0.1)):
+            for max_workers in (1, 4):
+                started = time.perf_counter()
+                summaries, _, _ = pdf_summarizer.summarize_pages(image_pages(12), max_workers=max_workers)
+                timings[max_workers] = time.perf_counter() - started
+                self.assertEqual(len(summaries), 12)
+
+        report("12 pages at 100ms per vision call", serial_seconds=timings[1], concurrent_4_seconds=timings[4])
+
+
+class EchoVisionModel:
+    """Stub for generate_content that answers every page marker of a vision call with a summary of that page.
+
+    Pages in drop are left out of multi-page answers and pages in empty get a marker without a summary,
+    like a model that skips or merges pages.
+    """
+
+    def __init__(self, drop=(), empty=()):
+        self.drop = set(drop)
+        self.empty = set(empty)
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, model_name, contents):
+        with self.lock:
+            self.calls.append(contents)
+        if len(contents) == 2:
+            return mock.Mock(text=f"summary of {contents[1]['data'].decode()}")
+
+        answer = []
+        for item, image in zip(contents[1::2], contents[2::2]):
+            page_num = int(pdf_summarizer.PAGE_MARKER_PATTERN.match(item).group(1))
+            if page_num in self.drop:
+                continue
+            answer.append(item if page_num in self.empty else f"{item}\nsummary of {image['data'].decode()}")
+        return mock.Mock(text="\n\n".join(answer))
+
+    def batches(self):
+        """The pages sent in every call, in the order the calls were made."""
+        return [[image["data"].decode() for image in call[2::2]] if len(call) > 2 else [call[1]["data"].decode()]
+                for call in self.calls]
+
+
+class PageBatchingTests(SimpleTestCase):
+    def test_sections_are_split_on_page_markers(self):
+        text = "Preamble\n=== Page 3 ===\nthird\n  == Page 4 ==  \nfourth\n=== Page 9 ===\nnot asked for"
+        self.assertEqual(pdf_summarizer.split_page_sections(text, {3, 4, 5}), {3: "third", 4: "fourth"})
+
+    def test_batch_comes_back_as_one_summary_per_page(self):
+        model = EchoVisionModel()
+        with mock.patch.object(pdf_summarizer, "generate_content", model):
+            summaries = pdf_summarizer.summarize_image_pages(dict(image_pages(3)))
+
+        self.assertEqual(summaries, {page_num: f"summary of page {page_num}" for page_num in (1, 2, 3)})
+        self.assertEqual(len(model.calls), 1)
+
+    def test_dropped_and_merged_pages_are_retried_alone(self):
+        model = EchoVisionModel(drop={2}, empty={3})
+        with mock.patch.object(pdf_summarizer, "generate_content", model):
+            summaries = pdf_summarizer.summarize_image_pages(dict(image_pages(4)))
+
+        self.assertEqual(summaries, {page_num: f"summary of page {page_num}" for page_num in (1, 2, 3, 4)})
+        self.assertEqual(model.batches(), [["page 1", "page 2", "page 3", "page 4"], ["page 2"], ["page 3"]])
+
+    def test_batches_are_capped_by_page_count(self):
+        model = EchoVisionModel()
+        with mock.patch.object(pdf_summarizer, "generate_content", model), \
+                self.settings(PDF_VISION_BATCH_PAGES=3, PDF_VISION_BATCH_BYTES=1024):
+            summaries, path_counts, _ = pdf_summarizer.summarize_pages(image_pages(7), max_workers=1)
+
+        self.assertEqual([len(batch) for batch in model.batches()], [3, 3, 1])
+        self.assertEqual(list(summaries), [1, 2, 3, 4, 5, 6, 7])
+        self.assertEqual(path_counts["vision"], 7)
+
+    def test_batches_are_capped_by_encoded_bytes(self):
+        model = EchoVisionModel()
+        # Every stub page is 6 bytes, so two fit in 13 bytes and a third does not
+        with mock.patch.object(pdf_summarizer, "generate_content", model), \
+                self.settings(PDF_VISION_BATCH_PAGES=10, PDF_VISION_BATCH_BYTES=13):
+            pdf_summarizer.summarize_pages(image_pages(5), max_workers=1)
+
+        self.assertEqual(model.batches(), [["page 1", "page 2"], ["page 3", "page 4"], ["page 5"]])
+
+    def test_concurrent_batches_keep_page_order(self):
+        model = EchoVisionModel(drop={5})
+        with mock.patch.object(pdf_summarizer, "generate_content", model), \
+                self.settings(PDF_VISION_BATCH_PAGES=2, PDF_VISION_BATCH_BYTES=1024):
+            summaries, _, failed_pages = pdf_summarizer.summarize_pages(reversed(image_pages(9)), max_workers=4)
+
+        self.assertEqual(list(summaries), list(range(1, 10)))
+        for page_num, summary in summaries.items():
+            self.assertEqual(summary, f"summary of page {page_num}")
+        self.assertEqual(failed_pages, [])
+
+    def test_text_pages_are_batched_by_characters(self):
+        pages = [(page_num, f"Page {page_num} text " * 5) for page_num in range(1, 5)]
+        with mock.patch.object(pdf_summarizer, "generate_content", side_effect=echo_text_model) as model, \
+                self.settings(PDF_TEXT_BATCH_CHARS=len(pages[0][1]) * 2):
+            summaries, path_counts, _ = pdf_summarizer.summarize_pages(pages, max_workers=1)
+
+        self.assertEqual(model.call_count, 2)
+        self.assertEqual(path_counts, {"text": 4, "vision": 0})
+        self.assertTrue(summaries[3].startswith("Page 3 text"))
+
+
+def echo_text_model(model_name, contents):
+    """Stub for generate_content that answers every page marker with the first line of that page."""
+    lines = contents.splitlines()
+    answer = [f"{line}\n{lines[index + 1]}" for index, line in enumerate(lines) if pdf_summarizer.PAGE_MARKER_PATTERN.match(line)]
+    return mock.Mock(text="\n".join(answer))
+
+
+@override_settings(PDF_PAGE_CACHE_ALIAS="default", PDF_RENDER_PROFILE="balanced")
+class ConcurrentUploadTests(SimpleTestCase):
+    def upload(self, index):
+        data = make_pdf(3, label=f"File {index} ")
+        if index % 2:
+            return make_upload(data, f"notes-{index}.pdf")
+        # Large uploads reach the view spooled to disk by Django
+        upload = TemporaryUploadedFile(f"notes-{index}.pdf", "application/pdf", len(data), None)
+        upload.write(data)
+        upload.seek(0)
+        return upload
+
+    def test_concurrent_uploads_each_get_their_own_pages(self):
+        uploads = [self.upload(index) for index in range(16)]
+
+        with mock.patch.object(pdf_summarizer, "generate_content", echo_text_model), \
+                ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(lambda upload: pdf_summarizer.summarize_pdf(upload, 1, 3), uploads))
+
+        for index, (summaries, stats) in enumerate(results):
+            self.assertEqual(list(summaries), [1, 2, 3])
+            for page_num, summary in summaries.items():
+                self.assertTrue(summary.startswith(f"File {index} Page {page_num} line 0"), summary)
+            self.assertEqual(stats["failed_pages"], [])
+        for upload in uploads:
+            upload.close()
+
+
+@override_settings(PDF_PAGE_CACHE_ALIAS="default", PDF_RENDER_PROFILE="balanced")
+class PageCacheTests(SimpleTestCase):
+    def setUp(self):
+        page_cache.get_cache().clear()
+
+    def summarize(self, data, start_page, end_page):
+        model = mock.Mock(side_effect=echo_text_model)
+        with mock.patch.object(pdf_summarizer, "generate_content", model):
+            summaries, stats = pdf_summarizer.summarize_pdf(make_upload(data), start_page, end_page)
+        return summaries, stats, model.call_count
+
+    def test_cached_pages_skip_inference(self):
+        data = make_pdf(3)
+        _, first, first_calls = self.summarize(data, 1, 3)
+        summaries, second, second_calls = self.summarize(data, 1, 3)
+
+        self.assertEqual((first["cache_hits"], first["cache_misses"]), (0, 3))
+        self.assertGreater(first_calls, 0)
+        self.assertEqual((second["cache_hits"], second["cache_misses"]), (3, 0))
+        self.assertEqual(second_calls, 0)
+        self.assertEqual(list(summaries), [1, 2, 3])
+
+    def test_partly_cached_range_only_sends_new_pages(self):
+        data = make_pdf(4)
+        self.summarize(data, 1, 2)
+        with mock.patch.object(pdf_summarizer, "generate_content", side_effect=echo_text_model) as model:
+            summaries, stats = pdf_summarizer.summarize_pdf(make_upload(data), 1, 4)
+
+        self.assertEqual((stats["cache_hits"], stats["cache_misses"]), (2, 2))
+        self.assertNotIn("=== Page 1 ===", model.call_args.args[1])
+        self.assertEqual(list(summaries), [1, 2, 3, 4])
+
+    def test_oversized_range_is_clamped_before_the_cache_lookup(self):
+        before = page_cache.get_cache_stats()
+        summaries, stats, _ = self.summarize(make_pdf(3), 1, 3_000_000)
+        after = page_cache.get_cache_stats()
+
+        self.assertEqual(list(summaries), [1, 2, 3])
+        self.assertEqual((stats["cache_hits"], stats["cache_misses"]), (0, 3))
+        self.assertEqual(after["misses"] - before["misses"], 3)
+
+
+class RenderProfileTests(SimpleTestCase):
+    def first_page(self, data):
+        document = fitz.open(stream=data, filetype="pdf")
+        self.addCleanup(document.close)
+        return document.load_page(0)
+
+    def test_profiles_control_color_and_size(self):
+        page = self.first_page(make_pdf(1))
+        grayscale = pdf_summarizer.render_page(page, {**pdf_summarizer.RENDER_PROFILES["scanned_notes"], "max_dimension": 500})
+        self.assertEqual(grayscale.mode, "L")
+        self.assertLessEqual(max(grayscale.size), 500)
+
+    def test_text_page_skips_rasterization(self):
+        page = self.first_page(make_pdf(1))
+        with mock.patch.object(pdf_summarizer, "render_page") as render_page:
+            payload = pdf_summarizer.page_payload(page, pdf_summarizer.RENDER_PROFILES["balanced"])
+        self.assertIsInstance(payload, str)
+        render_page.assert_not_called()
+
+    def test_short_page_is_encoded_as_an_image(self):
+        page = self.first_page(make_pdf(1, lines_per_page=2))
+        payload = pdf_summarizer.page_payload(page, pdf_summarizer.RENDER_PROFILES["balanced"])
+        self.assertEqual(payload["mime_type"], "image/jpeg")
+
+
+def make_scanned_pdf(page_count):
+    """Returns a PDF whose pages are photo-like images without a text layer, like scanned notes."""
+    scan = BytesIO()
+    Image.effect_noise((600, 800), 60).filter(ImageFilter.GaussianBlur(1)).convert("RGB").save(scan, "PNG")
+    document = fitz.open()
+    for _ in range(page_count):
+        page = document.new_page()
+        page.insert_image(page.rect, stream=scan.getvalue())
+    data = document.tobytes()
+    document.close()
+    return data
+
+
+@tag("benchmark")
+class RenderProfileBenchmark(SimpleTestCase):
+    def measure(self, data, kind):
+        document = fitz.open(stream=data, filetype="pdf")
+        self.addCleanup(document.close)
+
+        results = {}
+        for name, profile in pdf_summarizer.RENDER_PROFILES.items():
+            sizes, started = [], time.perf_counter()
+            for page in document:
+                image = pdf_summarizer.render_page(page, profile)
+                sizes.append(len(pdf_summarizer.pil_image_to_bytes(image, profile["format"], profile["quality"])))
+            results[name] = sum(sizes) / len(sizes)
+            report(f"{kind} pages, profile {name}", bytes_per_page=int(results[name]),
+                   ms_per_page=(time.perf_counter() - started) * 1000 / len(sizes))
+        return document, results
+
+    def test_scanned_pages_per_profile(self):
+        _, results = self.measure(make_scanned_pdf(5), "scanned")
+        # Lossy encoding pays for the higher resolution the vision model needs to read scans
+        self.assertLess(results["balanced"], results["lossless"])
+        self.assertLess(results["scanned_notes"], results["lossless"])
+
+    def test_text_pages_per_profile(self):
+        document, results = self.measure(make_pdf(5), "text")
+        # Text-layer pages under "balanced" send their extracted text instead of any image
+        text_bytes = sum(len(pdf_summarizer.page_payload(page, pdf_summarizer.RENDER_PROFILES["balanced"]).encode()) for page in document)
+        report("text pages, profile balanced with the text layer", bytes_per_page=text_bytes // len(document))
+        self.assertLess(text_bytes / len(document), min(results.values()))
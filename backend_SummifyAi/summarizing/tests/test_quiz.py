@@ -0,0 +1,205 @@
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from django.contrib.auth.models import User
+from django.db import close_old_connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings, tag
+from django.urls import reverse
+from rest_framework.test import APIClient
+from user_profile.models import UserStatistics
+from ..jobs import claim_pregenerated_quiz, fill_quiz_pool
+from ..models import GeneratedQuiz, PDFSummary
+from ..quiz_parser import MCQ_KEY, TF_KEY
+from ..views import QuizGeneratorView
+from .utils import report
+
+TOPICS = ("alpha", "beta", "gamma")
+# One section per topic, each close to QUIZ_SHARD_CHARS so every topic lands in its own shard
+SUMMARY = "\n\n".join(" ".join([topic] * 300) for topic in TOPICS)
+SHARED_QUESTION = "What is this summary about?"
+
+
+class FakeQuizChain:
+    """Stands in for the QA chain: sleeps like a model call and asks one question every shard also asks."""
+
+    def __init__(self, base_latency=0.0, latency_per_question=0.0, barrier=None):
+        self.base_latency = base_latency
+        self.latency_per_question = latency_per_question
+        self.barrier = barrier
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, inputs, return_only_outputs=True):
+        with self.lock:
+            self.calls += 1
+        mcq_count = int(re.search(r"generate (\d+) multiple-choice", inputs["question"]).group(1))
+        true_false_count = int(re.search(r"include (\d+) True or False", inputs["question"]).group(1))
+        context = " ".join(document.page_content for document in inputs["input_documents"])
+        topic = "-".join(topic for topic in TOPICS if topic in context)
+
+        if self.barrier is not None:
+            self.barrier.wait()
+        time.sleep(self.base_latency + self.latency_per_question * (mcq_count + true_false_count))
+
+        options = {"A": "One", "B": "Two", "C": "Three", "D": "Four"}
+        quiz = {
+            MCQ_KEY: [{"question": SHARED_QUESTION, "options": options, "correct_option": "A"}] + [
+                {"question": f"{topic} question {i}?", "options": options, "correct_option": "B"}
+                for i in range(1, mcq_count)
+            ],
+            TF_KEY: [{"statement": SHARED_QUESTION, "correct_option": "True"}] + [
+                {"statement": f"{topic} statement {i}.", "correct_option": "False"}
+                for i in range(1, true_false_count)
+            ],
+        }
+        return {"output_text": json.dumps(quiz)}
+
+
+def generate_quiz(chain):
+    generator = QuizGeneratorView()
+    with mock.patch("summarizing.views.get_qa_chain", return_value=chain):
+        return json.loads(generator.generate_quiz(SUMMARY, user=None))
+
+
+@override_settings(QUIZ_SHARDS=3, QUIZ_SHARD_CHARS=2000, QUIZ_SHARD_MAX_WORKERS=4)
+class ShardedQuizTests(SimpleTestCase):
+    def test_shards_are_generated_concurrently(self):
+        # Every call waits for the other two, so this only finishes if all three run at once
+        chain = FakeQuizChain(barrier=threading.Barrier(3, timeout=10))
+        generate_quiz(chain)
+        self.assertEqual(chain.calls, 3)
+
+    def test_every_shard_is_represented_after_trimming(self):
+        quiz = generate_quiz(FakeQuizChain())
+
+        self.assertEqual(len(quiz[MCQ_KEY]), QuizGeneratorView.mcq_count)
+        self.assertEqual(len(quiz[TF_KEY]), QuizGeneratorView.true_false_count)
+        for key, text_field in ((MCQ_KEY, "question"), (TF_KEY, "statement")):
+            texts = [question[text_field] for question in quiz[key]]
+            for topic in TOPICS:
+                self.assertTrue(any(text.startswith(topic) for text in texts), f"{topic} is missing from {key}")
+
+    def test_duplicate_questions_are_merged(self):
+        quiz = generate_quiz(FakeQuizChain())
+
+        for key, text_field in ((MCQ_KEY, "question"), (TF_KEY, "statement")):
+            texts = [question[text_field] for question in quiz[key]]
+            self.assertEqual(len(texts), len(set(texts)))
+            self.assertEqual(texts.count(SHARED_QUESTION), 1)
+
+    @override_settings(QUIZ_SHARDS=1)
+    def test_single_shard_uses_one_call(self):
+        chain = FakeQuizChain()
+        quiz = generate_quiz(chain)
+        self.assertEqual(chain.calls, 1)
+        self.assertTrue(quiz[MCQ_KEY])
+
+
+def create_summary(user, summary=SUMMARY):
+    return PDFSummary.objects.create(user=user, pdf_file="pdfs/notes.pdf", start_page_number=1, end_page_number=3, summary=summary)
+
+
+@override_settings(QUIZ_SHARDS=3, QUIZ_SHARD_CHARS=2000, QUIZ_POOL_SIZE=2)
+class QuizPoolTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("student", password="secret")
+        self.pdf_summary = create_summary(self.user)
+        self.chain = FakeQuizChain()
+        patcher = mock.patch("summarizing.views.get_qa_chain", return_value=self.chain)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_fill_tops_the_pool_up_to_its_size(self):
+        GeneratedQuiz.objects.create(user=self.user, pdf_summary=self.pdf_summary, quiz_data="{}", served=False)
+        fill_quiz_pool(self.pdf_summary.id)
+
+        self.assertEqual(GeneratedQuiz.objects.filter(pdf_summary=self.pdf_summary, served=False).count(), 2)
+        self.assertEqual(self.chain.calls, 3)  # one sharded quiz of three calls
+
+    def test_claims_hand_out_each_quiz_once_oldest_first(self):
+        fill_quiz_pool(self.pdf_summary.id)
+        pooled = list(GeneratedQuiz.objects.filter(served=False).order_by("created_at"))
+
+        first, second = claim_pregenerated_quiz(self.pdf_summary), claim_pregenerated_quiz(self.pdf_summary)
+        self.assertEqual([first.id, second.id], [quiz.id for quiz in pooled])
+        self.assertTrue(first.served)
+        self.assertIsNone(claim_pregenerated_quiz(self.pdf_summary))
+        self.assertFalse(GeneratedQuiz.objects.filter(served=False).exists())
+
+    def test_view_serves_a_pooled_quiz_and_refills(self):
+        fill_quiz_pool(self.pdf_summary.id)
+        calls = self.chain.calls
+        UserStatistics.objects.create(user=self.user)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with mock.patch("summarizing.views.schedule_quiz_pool") as schedule:
+            response = client.post(reverse("generate_quiz"))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.chain.calls, calls)
+        self.assertTrue(GeneratedQuiz.objects.get(id=response.data["quiz_id"]).served)
+        schedule.assert_called_once_with(self.pdf_summary.id)
+
+    @override_settings(QUIZ_SHARDS=1, CONTEXT_STUFF_MAX_TOKENS=100)
+    def test_fill_builds_the_retrieval_index_of_long_summaries(self):
+        with mock.patch("summarizing.views.get_or_build_index") as build, \
+                mock.patch("summarizing.views.get_context_documents", return_value=[]), \
+                mock.patch("summarizing.embeddings.get_embeddings"):
+            fill_quiz_pool(self.pdf_summary.id)
+
+        build.assert_called_once()
+        self.assertEqual(build.call_args.args[0], self.user)
+
+    def test_fill_skips_the_index_when_it_is_not_used(self):
+        for shards, max_tokens in ((3, 100), (1, 6000)):
+            with self.subTest(shards=shards, max_tokens=max_tokens), \
+                    override_settings(QUIZ_SHARDS=shards, CONTEXT_STUFF_MAX_TOKENS=max_tokens), \
+                    mock.patch("summarizing.views.get_or_build_index") as build:
+                GeneratedQuiz.objects.all().delete()
+                fill_quiz_pool(self.pdf_summary.id)
+                build.assert_not_called()
+
+
+class ConcurrentClaimTests(TransactionTestCase):
+    def test_concurrent_claims_never_share_a_quiz(self):
+        user = User.objects.create_user("student", password="secret")
+        pdf_summary = create_summary(user)
+        for _ in range(3):
+            GeneratedQuiz.objects.create(user=user, pdf_summary=pdf_summary, quiz_data="{}", served=False)
+        barrier = threading.Barrier(8, timeout=10)
+
+        def claim():
+            try:
+                barrier.wait()
+                quiz = claim_pregenerated_quiz(pdf_summary)
+                return quiz and quiz.id
+            finally:
+                close_old_connections()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            claimed = [quiz_id for quiz_id in executor.map(lambda _: claim(), range(8)) if quiz_id]
+
+        self.assertEqual(sorted(claimed), sorted(GeneratedQuiz.objects.values_list("id", flat=True)))
+
+
+@tag("benchmark")
+class ShardedQuizBenchmark(SimpleTestCase):
+    def test_sharded_vs_single_call(self):
+        # Model latency grows with the number of questions generated, like output tokens do
+        def timed(shards):
+            chain = FakeQuizChain(base_latency=0.1, latency_per_question=0.02)
+            with override_settings(QUIZ_SHARDS=shards, QUIZ_SHARD_CHARS=2000, QUIZ_SHARD_MAX_WORKERS=4):
+                started = time.perf_counter()
+                generate_quiz(chain)
+                return time.perf_counter() - started
+
+        # Best of three, so the first run's imports are not counted
+        single = min(timed(1) for _ in range(3))
+        sharded = min(timed(3) for _ in range(3))
+
+        report("Quiz generation with simulated model latency", single_call_seconds=single,
+               three_shards_seconds=sharded, speedup=single / sharded)
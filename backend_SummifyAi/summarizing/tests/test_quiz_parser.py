@@ -0,0 +1,127 @@
+import json
+import re
+import time
+from django.test import SimpleTestCase, tag
+from ..quiz_parser import MCQ_KEY, TF_KEY, parse_quiz
+from .utils import report
+
+MCQ = {"question": "What does a mitochondrion produce?",
+       "options": {"A": "ATP", "B": "DNA", "C": "Lipids", "D": "Starch"}, "correct_option": "A"}
+TF = {"statement": "Water boils at 100 C at sea level.", "options": {"True": "True", "False": "False"},
+      "correct_option": "True"}
+VALID = json.dumps({"questions": [MCQ, TF]})
+
+# (name, reply, expected multiple choice count, expected true/false count)
+CORPUS = [
+    ("valid json", VALID, 1, 1),
+    ("code fence", f"```json\n{VALID}\n```", 1, 1),
+    ("prose around the json", f"Here is your quiz:\n{VALID}\nGood luck!", 1, 1),
+    ("trailing commas", VALID.replace('"A"}', '"A",}').replace('"True"}', '"True",}'), 1, 1),
+    ("single quotes", "{'questions': [{'question': 'Which gas do plants absorb?', "
+                      "'options': {'A': 'Oxygen', 'B': 'Carbon dioxide', 'C': 'Helium', 'D': 'Neon'}, "
+                      "'correct_option': 'B'}]}", 1, 0),
+    ("apostrophe in a value", '{"questions": [{"question": "What is Newton\'s first law about?", '
+                              '"options": {"A": "Inertia", "B": "Heat", "C": "Light", "D": "Sound"}, '
+                              '"correct_option": "A"}]}', 1, 0),
+    ("unquoted keys", "{questions: [{question: \"Largest planet?\", options: {A: \"Mars\", B: \"Jupiter\", "
+                      "C: \"Venus\", D: \"Earth\"}, correct_option: \"B\"}]}", 1, 0),
+    ("python booleans", '{"questions": [{"statement": "The sun is a star.", "correct_option": True}, '
+                        '{"statement": "Bats are birds.", "correct_option": False}]}', 0, 2),
+    ("lowercase true/false strings", '{"questions": [{"statement": "Ice is solid water.", '
+                                     '"options": {"true": "true", "false": "false"}, "correct_option": "true"}, '
+                                     '{"question": "Sound travels in a vacuum.", "options": ["TRUE", "FALSE"], '
+                                     '"answer": "FALSE"}]}', 0, 2),
+    ("options as a list", '{"questions": [{"question": "2 + 2?", "options": ["3", "4", "5", "6"], '
+                          '"correct_option": "B"}]}', 1, 0),
+    ("answer as option text", '{"questions": [{"question": "Capital of France?", '
+                              '"options": {"A": "Berlin", "B": "paris", "C": "Rome", "D": "Madrid"}, '
+                              '"answer": "Paris"}]}', 1, 0),
+    ("answer as labelled text", '{"questions": [{"question": "Capital of Italy?", '
+                                '"options": {"A": "Berlin", "B": "Paris", "C": "Rome", "D": "Madrid"}, '
+                                '"correct_option": "C) Rome"}]}', 1, 0),
+    ("one broken question among good ones",
+     '{"questions": [' + json.dumps(MCQ) + ', {"question": "Broken?", "options": {"A": "x" "B": "y"}}, '
+     + json.dumps(TF) + "]}", 1, 1),
+    ("comment lines", '{"questions": [\n// multiple choice\n' + json.dumps(MCQ) + "\n]}", 1, 0),
+    ("top-level array", json.dumps([MCQ, {**MCQ, "question": "What does a ribosome produce?"}, TF]), 2, 1),
+    ("quiz split over two objects", json.dumps({MCQ_KEY: [MCQ]}) + "\n\n" + json.dumps({TF_KEY: [TF]}), 1, 1),
+    ("example object before the quiz", 'Every question looks like {"question": "x"}. The quiz:\n' + VALID, 1, 1),
+    ("broken object after a valid one", json.dumps({MCQ_KEY: [MCQ]}) + "\n{'true_or_false_questions': "
+                                        "[{'statement': 'Ice floats.', 'correct_option': 'True',}]}", 1, 1),
+    ("missing option", '{"questions": [{"question": "Incomplete?", "options": {"A": "x", "B": "y", "C": "z"}, '
+                       '"correct_option": "A"}]}', 0, 0),
+    ("answer not among the options", '{"questions": [{"question": "Unknown?", '
+                                     '"options": {"A": "w", "B": "x", "C": "y", "D": "z"}, '
+                                     '"correct_option": "Q"}]}', 0, 0),
+    ("no json at all", "Sorry, I cannot generate a quiz from this text.", 0, 0),
+]
+
+
+def legacy_parse(text):
+    """The parser the quiz view used before quiz_parser, kept as the benchmark baseline."""
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end == -1:
+        raise ValueError("No JSON-like structure found in the response.")
+    cleaned = text[start:end + 1].replace("'", '"')
+    cleaned = re.sub(r"(\w+)(?=\s*:)", r'"\1"', cleaned)
+    cleaned = re.sub(r",\s*([\]}])", r"\1", cleaned)
+    return json.loads(cleaned)
+
+
+class ParseQuizTests(SimpleTestCase):
+    def test_corpus(self):
+        for name, reply, mcq_count, tf_count in CORPUS:
+            with self.subTest(name):
+                if not mcq_count and not tf_count:
+                    with self.assertRaises(ValueError):
+                        parse_quiz(reply)
+                    continue
+                quiz = parse_quiz(reply)
+                self.assertEqual(len(quiz[MCQ_KEY]), mcq_count)
+                self.assertEqual(len(quiz[TF_KEY]), tf_count)
+
+    def test_true_false_answers_are_case_folded(self):
+        quiz = parse_quiz(CORPUS[8][1])
+        self.assertEqual([question["correct_option"] for question in quiz[TF_KEY]], ["True", "False"])
+        self.assertEqual(quiz[TF_KEY][0]["options"], {"True": "True", "False": "False"})
+
+    def test_option_text_is_matched_before_the_label(self):
+        reply = json.dumps({"questions": [{
+            "question": "Which term means knowable without experience?",
+            "options": {"A": "Empirical", "B": "Inductive", "C": "A posteriori", "D": "A priori"},
+            "correct_option": "a priori",
+        }]})
+        self.assertEqual(parse_quiz(reply)[MCQ_KEY][0]["correct_option"], "D")
+
+    def test_label_answers(self):
+        for answer in ("B", "b", "(B)", "B) Jupiter", "B. Jupiter"):
+            with self.subTest(answer):
+                reply = CORPUS[6][1].replace('"B"}', json.dumps(answer) + "}")
+                self.assertEqual(parse_quiz(reply)[MCQ_KEY][0]["correct_option"], "B")
+
+
+@tag("benchmark")
+class ParseQuizBenchmark(SimpleTestCase):
+    def test_parse_rate_and_time(self):
+        replies = [reply for _, reply, mcq_count, tf_count in CORPUS if mcq_count or tf_count]
+        rounds = 200
+
+        def measure(parse):
+            parsed, started = 0, time.perf_counter()
+            for _ in range(rounds):
+                for reply in replies:
+                    try:
+                        parse(reply)
+                        parsed += 1
+                    except ValueError:
+                        pass
+            return parsed / (rounds * len(replies)), (time.perf_counter() - started) / (rounds * len(replies))
+
+        rate, seconds = measure(parse_quiz)
+        legacy_rate, legacy_seconds = measure(legacy_parse)
+
+        report(f"Quiz reply parsing, {len(replies)} salvageable replies",
+               parse_rate=rate, legacy_parse_rate=legacy_rate,
+               ms_per_reply=seconds * 1000, legacy_ms_per_reply=legacy_seconds * 1000)
+        self.assertEqual(rate, 1.0)
+        self.assertGreater(rate, legacy_rate)
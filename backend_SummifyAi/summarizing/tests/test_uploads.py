@@ -0,0 +1,76 @@
+import os
+from pathlib import Path
+from unittest import mock
+from django.contrib.auth.models import User
+from django.urls import reverse
+from summarizing.models import PDFMindMap, PDFSummaryJob
+from summarizing.uploads import UPLOAD_DIR, reap_uploads, store_upload
+from .utils import MediaRootTestCase, make_pdf, make_upload
+
+
+def disk_usage(root):
+    return sum(path.stat().st_size for path in Path(root).rglob("*") if path.is_file())
+
+
+class RetainedUploadTests(MediaRootTestCase):
+    def test_repeated_identical_uploads_do_not_grow_the_disk(self):
+        data = make_pdf(3)
+        mindmap = {"title": "Notes", "nodes": [{"id": "1", "text": "ARIMA"}]}
+
+        usage = []
+        with mock.patch("summarizing.views.generate_mindmap", return_value=mindmap), \
+                self.settings(MINDMAP_MODE="hierarchical"):
+            for _ in range(5):
+                response = self.client.post(reverse("pdf_mindmap"), {"pdf_file": make_upload(data, "lecture.pdf")}, format="multipart")
+                self.assertEqual(response.status_code, 200)
+                usage.append(disk_usage(self.media_root))
+
+        self.assertEqual(usage, [len(data)] * 5)
+        self.assertEqual(os.listdir(Path(self.media_root, UPLOAD_DIR)), [os.path.basename(store_upload(make_upload(data)))])
+
+    def test_same_bytes_under_different_names_are_stored_once(self):
+        data = make_pdf(2)
+        self.assertEqual(store_upload(make_upload(data, "a.pdf")), store_upload(make_upload(data, "b.pdf")))
+        self.assertNotEqual(store_upload(make_upload(data)), store_upload(make_upload(make_pdf(3))))
+        self.assertEqual(len(os.listdir(Path(self.media_root, UPLOAD_DIR))), 2)
+
+    def test_reaper_deletes_the_oldest_uploads_over_quota_except_unfinished_jobs(self):
+        names = [store_upload(make_upload(make_pdf(1, label=f"File {index} "))) for index in range(4)]
+        for age, name in enumerate(reversed(names)):
+            # names[0] is the oldest file
+            os.utime(Path(self.media_root, name), (1_000_000 - age * 1000,) * 2)
+        PDFSummaryJob.objects.create(user=self.user, pdf_file=names[0], start_page_number=1, end_page_number=1)
+
+        size = Path(self.media_root, names[1]).stat().st_size
+        deleted = reap_uploads(max_bytes=disk_usage(self.media_root) - size)
+
+        self.assertEqual(deleted, [names[1]])
+        self.assertTrue(Path(self.media_root, names[0]).exists())
+        self.assertEqual(reap_uploads(max_bytes=10 ** 9), [])
+
+    def test_duplicate_upload_counts_as_recent_use(self):
+        pdfs = [make_pdf(1, label=f"File {index} ") for index in range(2)]
+        names = [store_upload(make_upload(data)) for data in pdfs]
+        for age, name in enumerate(reversed(names)):
+            os.utime(Path(self.media_root, name), (1_000_000 - age * 1000,) * 2)
+
+        # Uploading the oldest file again makes the other one the least recently used
+        store_upload(make_upload(pdfs[0]))
+        size = Path(self.media_root, names[1]).stat().st_size
+
+        self.assertEqual(reap_uploads(max_bytes=disk_usage(self.media_root) - size), [names[1]])
+
+    def test_mindmap_served_from_the_database_restores_a_reaped_upload(self):
+        data = make_pdf(2)
+        mindmap = {"title": "Notes", "nodes": [{"id": "1", "text": "ARIMA"}]}
+        with mock.patch("summarizing.views.generate_mindmap", return_value=mindmap) as generate, \
+                self.settings(MINDMAP_MODE="hierarchical"):
+            first = self.client.post(reverse("pdf_mindmap"), {"pdf_file": make_upload(data)}, format="multipart")
+            self.assertEqual(reap_uploads(max_bytes=0), [PDFMindMap.objects.get(id=first.data["id"]).pdf_file.name])
+
+            self.client.force_authenticate(User.objects.create_user("other", password="secret"))
+            response = self.client.post(reverse("pdf_mindmap"), {"pdf_file": make_upload(data)}, format="multipart")
+
+        generate.assert_called_once()
+        stored = PDFMindMap.objects.get(id=response.data["id"])
+        self.assertEqual(Path(self.media_root, stored.pdf_file.name).read_bytes(), data)
@@ -0,0 +1,161 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+from django.test import SimpleTestCase, override_settings, tag
+from summarizing import vector_store
+from summarizing.embeddings import HashingEmbeddings
+from .utils import report
+
+
+class FakeUser:
+    def __init__(self, id):
+        self.id = id
+
+
+def document_chunks(owner, count=12):
+    return [f"{owner} private notes, chapter {index}: topic {owner}-{index} explained in detail." for index in range(count)]
+
+
+class TemporaryIndexRootTestCase(SimpleTestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        # Force retrieval so every call goes through the per-user FAISS indexes
+        overrides = override_settings(VECTOR_INDEX_ROOT=Path(root.name), EMBEDDING_PROVIDER="local", CONTEXT_STUFF_MAX_TOKENS=0)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.addCleanup(vector_store._loaded.clear)
+        self.root = Path(root.name)
+
+
+class IndexStoreTests(TemporaryIndexRootTestCase):
+    def test_concurrent_users_never_see_each_others_documents(self):
+        users = {"alice": FakeUser(1), "bob": FakeUser(2)}
+        chunks = {owner: document_chunks(owner) for owner in users}
+
+        def ask(owner):
+            docs = vector_store.get_context_documents(users[owner], chunks[owner], "explain the topic in detail")
+            return owner, [doc.page_content for doc in docs]
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(ask, ["alice", "bob"] * 20))
+
+        for owner, contents in results:
+            self.assertTrue(contents)
+            self.assertTrue(set(contents) <= set(chunks[owner]), (owner, contents))
+        # One index per user, built once no matter how many requests raced for it
+        self.assertEqual(sorted(path.name for path in self.root.iterdir()), ["user_1", "user_2"])
+        for user_dir in self.root.iterdir():
+            self.assertEqual(len(list(user_dir.iterdir())), 1)
+
+    def test_same_document_is_indexed_separately_per_user(self):
+        chunks = document_chunks("shared")
+        embeddings = HashingEmbeddings()
+        first = vector_store.get_or_build_index(FakeUser(1), chunks, embeddings)
+        second = vector_store.get_or_build_index(FakeUser(2), chunks, embeddings)
+        self.assertEqual(first.name, second.name)
+        self.assertNotEqual(first.parent, second.parent)
+
+    def test_index_built_by_another_process_meanwhile_is_reused(self):
+        chunks = document_chunks("alice")
+        real_replace = os.replace
+
+        def replace_after_other_process(src, dst):
+            # Another worker process finished the same index just before this one
+            os.makedirs(dst)
+            Path(dst, "index.faiss").write_bytes(b"built elsewhere")
+            return real_replace(src, dst)
+
+        with mock.patch.object(vector_store.os, "replace", replace_after_other_process):
+            index_dir = vector_store.get_or_build_index(FakeUser(1), chunks, HashingEmbeddings())
+
+        self.assertEqual(Path(index_dir, "index.faiss").read_bytes(), b"built elsewhere")
+        self.assertEqual([path.name for path in index_dir.parent.iterdir()], [index_dir.name])
+
+
+class LoadedIndexCacheTests(TemporaryIndexRootTestCase):
+    def test_loaded_indexes_are_reused_and_bounded(self):
+        embeddings = HashingEmbeddings()
+        first = vector_store.get_or_build_index(FakeUser(1), document_chunks("alice"), embeddings)
+        before = vector_store.get_cache_stats()
+
+        self.assertIs(vector_store.load_index(first, embeddings), vector_store.load_index(first, embeddings))
+        self.assertEqual(vector_store.get_cache_stats()["hits"], before["hits"] + 2)
+
+        # A budget smaller than two indexes keeps only the most recently used one in memory
+        with self.settings(VECTOR_STORE_CACHE_MAX_BYTES=vector_store.dir_size(first) + 1):
+            second = vector_store.get_or_build_index(FakeUser(1), document_chunks("bob"), embeddings)
+        self.assertEqual(list(vector_store._loaded), [second])
+
+
+class ContextStrategyTests(TemporaryIndexRootTestCase):
+    def test_estimate_tokens(self):
+        self.assertEqual(vector_store.estimate_tokens(["a" * 400, "b" * 402]), 200)
+
+    def test_documents_within_the_budget_are_stuffed_whole(self):
+        chunks = document_chunks("alice", count=40)
+        with self.settings(CONTEXT_STUFF_MAX_TOKENS=vector_store.estimate_tokens(chunks)), \
+                mock.patch("summarizing.embeddings.get_embeddings") as get_embeddings:
+            docs = vector_store.get_context_documents(FakeUser(1), chunks, "explain the topic in detail")
+
+        self.assertEqual([doc.page_content for doc in docs], chunks)
+        get_embeddings.assert_not_called()
+        self.assertEqual(list(self.root.iterdir()), [])
+
+    def test_documents_over_the_budget_go_through_retrieval(self):
+        chunks = document_chunks("alice", count=40)
+        with self.settings(CONTEXT_STUFF_MAX_TOKENS=vector_store.estimate_tokens(chunks) - 1):
+            docs = vector_store.get_context_documents(FakeUser(1), chunks, "explain the topic in detail")
+
+        self.assertLess(len(docs), len(chunks))
+        self.assertTrue({doc.page_content for doc in docs} <= set(chunks))
+        self.assertEqual([path.name for path in self.root.iterdir()], ["user_1"])
+
+
+@tag("benchmark")
+class LoadedIndexCacheBenchmark(TemporaryIndexRootTestCase):
+    def test_request_path_with_and_without_the_cache(self):
+        user, chunks = FakeUser(1), document_chunks("alice", count=400)
+        vector_store.get_context_documents(user, chunks, "warm up")
+
+        timings = {}
+        for cached in (False, True):
+            started = time.perf_counter()
+            for _ in range(20):
+                if not cached:
+                    # What every request paid before: FAISS.load_local right after the index was saved
+                    vector_store._loaded.clear()
+                vector_store.get_context_documents(user, chunks, "explain the topic in detail")
+            timings[cached] = (time.perf_counter() - started) / 20
+
+        report("retrieval request path, 400 chunks", load_local_ms=timings[False] * 1000, in_memory_ms=timings[True] * 1000)
+
+
+@tag("benchmark")
+class ContextStrategyBenchmark(TemporaryIndexRootTestCase):
+    def test_stuffing_vs_retrieval_on_summary_sizes(self):
+        from summarizing.views import QuizGeneratorView
+
+        generator = QuizGeneratorView()
+        for tokens in (1500, 3000, 6000):
+            # Summaries are chunked the way the quiz view chunks them before asking for context
+            sentences = [f"Section {index} explains concept {index} with a worked example and its formula." for index in range(tokens * 4 // 80)]
+            chunks = generator.get_text_chunks(" ".join(sentences))
+            user = FakeUser(tokens)
+
+            timings = {}
+            for name, max_tokens in (("stuff", tokens * 2), ("retrieval", 0)):
+                with self.settings(CONTEXT_STUFF_MAX_TOKENS=max_tokens):
+                    started = time.perf_counter()
+                    docs = vector_store.get_context_documents(user, chunks, "Generate a quiz")
+                    timings[f"{name}_first_ms"] = (time.perf_counter() - started) * 1000
+                    started = time.perf_counter()
+                    for _ in range(20):
+                        vector_store.get_context_documents(user, chunks, "Generate a quiz")
+                    timings[f"{name}_repeat_ms"] = (time.perf_counter() - started) * 1000 / 20
+                    timings[f"{name}_context_tokens"] = vector_store.estimate_tokens([doc.page_content for doc in docs])
+
+            report(f"quiz context for a {tokens} token summary, {len(chunks)} chunks, local embeddings", **timings)
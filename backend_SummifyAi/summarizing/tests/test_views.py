@@ -0,0 +1,212 @@
+import json
+import time
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import override_settings, tag
+from django.urls import reverse
+from django.utils import timezone
+from user_profile.models import UserStatistics
+from summarizing import mind_map, yt_cache
+from summarizing.models import PDFMindMap, YouTubeSummary, YouTubeTranscript
+from summarizing.page_cache import hash_pdf_file
+from .utils import FakeGemini, MediaRootTestCase, make_pdf, make_upload, report
+
+MINDMAP = {"title": "Notes", "nodes": [{"id": "1", "text": "ARIMA"}]}
+
+
+@override_settings(MINDMAP_MODE="hierarchical")
+class PDFMindmapViewTests(MediaRootTestCase):
+    def post(self, data, generated=MINDMAP):
+        with mock.patch("summarizing.views.generate_mindmap", return_value=generated) as generate:
+            response = self.client.post(reverse("pdf_mindmap"), {"pdf_file": make_upload(data)}, format="multipart")
+        return response, generate
+
+    def test_same_pdf_is_served_from_the_database(self):
+        data = make_pdf(2)
+        first, _ = self.post(data)
+        second, generate = self.post(data)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.data["mindmap"], MINDMAP)
+        generate.assert_not_called()
+
+    def test_new_mode_or_prompt_version_regenerates(self):
+        data = make_pdf(2)
+        self.post(data)
+
+        with mock.patch.object(mind_map, "OUTLINE_PROMPT_VERSION", "v-next"):
+            _, generate = self.post(data)
+        generate.assert_called_once()
+
+        with self.settings(MINDMAP_MODE="retrieval"):
+            _, generate = self.post(data)
+        generate.assert_called_once()
+
+    def test_empty_trees_are_neither_stored_nor_served(self):
+        data = make_pdf(2)
+        response, _ = self.post(data, generated={"title": "", "nodes": []})
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(PDFMindMap.objects.exists())
+
+        # An empty tree stored before this check is regenerated rather than served
+        PDFMindMap.objects.create(
+            user=self.user, pdf_file="pdfs/old.pdf", content_hash=hash_pdf_file(make_upload(data)),
+            mindmap_version=mind_map.get_mindmap_version(), mindmap_json={"title": "", "nodes": []}
+        )
+        response, generate = self.post(data)
+        generate.assert_called_once()
+        self.assertEqual(response.data["mindmap"], MINDMAP)
+
+    def test_pdf_without_text_is_rejected(self):
+        with mock.patch("summarizing.views.generate_mindmap", side_effect=ValueError("No text")):
+            response = self.client.post(reverse("pdf_mindmap"), {"pdf_file": make_upload(make_pdf(1))}, format="multipart")
+        self.assertEqual(response.status_code, 422)
+
+
+
+class PDFMindmapHistoryViewTests(MediaRootTestCase):
+    def mindmap(self, user, title):
+        mindmap = PDFMindMap.objects.create(user=user, pdf_file="pdfs/notes.pdf", mindmap_json={"title": title, "nodes": []})
+        # One minute apart, so the newest-first order never depends on clock resolution
+        PDFMindMap.objects.filter(id=mindmap.id).update(created_at=timezone.now() + timedelta(minutes=PDFMindMap.objects.count()))
+        return mindmap
+
+    def test_list_is_paginated_newest_first(self):
+        ids = [self.mindmap(self.user, f"Map {index}").id for index in range(12)]
+
+        first = self.client.get(reverse("pdf_mindmap_list"))
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.data["count"], 12)
+        self.assertEqual([item["id"] for item in first.data["results"]], ids[::-1][:10])
+        self.assertIsNotNone(first.data["next"])
+
+        second = self.client.get(reverse("pdf_mindmap_list"), {"page": 2})
+        self.assertEqual([item["id"] for item in second.data["results"]], ids[1::-1])
+
+        small = self.client.get(reverse("pdf_mindmap_list"), {"page_size": 5})
+        self.assertEqual(len(small.data["results"]), 5)
+
+    def test_list_items_carry_the_title_but_not_the_tree(self):
+        self.mindmap(self.user, "Time series")
+        legacy = PDFMindMap.objects.create(user=self.user, pdf_file="pdfs/old.pdf", mindmap_json=["legacy"])
+        PDFMindMap.objects.filter(id=legacy.id).update(created_at=timezone.now() + timedelta(days=1))
+
+        items = self.client.get(reverse("pdf_mindmap_list")).data["results"]
+        self.assertEqual([item["title"] for item in items], ["", "Time series"])
+        self.assertEqual(set(items[0]), {"id", "pdf_file", "title", "created_at"})
+
+    def test_users_only_see_their_own_mind_maps(self):
+        other = User.objects.create_user("other", password="secret")
+        own = self.mindmap(self.user, "Mine")
+        foreign = self.mindmap(other, "Theirs")
+
+        items = self.client.get(reverse("pdf_mindmap_list")).data["results"]
+        self.assertEqual([item["id"] for item in items], [own.id])
+
+        detail = self.client.get(reverse("pdf_mindmap_detail", args=[own.id]))
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual(detail.data["mindmap_json"]["title"], "Mine")
+        self.assertEqual(self.client.get(reverse("pdf_mindmap_detail", args=[foreign.id])).status_code, 404)
+
+
+VIDEO_URL = "https://www.youtube.com/watch?v=abcdefghijk"
+
+
+def parse_events(chunks):
+    """Returns [(event, data)] of server-sent event chunks."""
+    events = []
+    for block in b"".join(chunks).decode().split("\n\n"):
+        if block:
+            event, data = block.split("\n")
+            events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+@override_settings(YT_SUMMARY_CACHE_ALIAS="default", YT_TRANSCRIPT_LANGUAGES=("en",))
+class YouTubeSummaryStreamViewTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        yt_cache.get_cache().clear()
+        UserStatistics.objects.create(user=self.user)
+        YouTubeTranscript.objects.create(video_id="abcdefghijk", language="en", text="transcript text",
+                                         items=[{"text": "transcript text", "start": 0}])
+
+    def stream(self, model):
+        with mock.patch("summarizing.yt_summarizer.get_generative_model", return_value=model):
+            response = self.client.post(reverse("summarize_youtube_video_stream"), {"youtube_url": VIDEO_URL})
+            self.assertEqual(response["Content-Type"], "text/event-stream")
+            return parse_events(response.streaming_content)
+
+    def test_tokens_are_streamed_then_saved(self):
+        events = self.stream(FakeGemini())
+
+        self.assertEqual([event for event, _ in events], ["start", "token", "token", "token", "done"])
+        self.assertEqual("".join(data["text"] for event, data in events if event == "token"), "Lecture notes here.")
+        summary = YouTubeSummary.objects.get(id=events[-1][1]["id"])
+        self.assertEqual((summary.user, summary.summary, summary.shared_transcript.video_id),
+                         (self.user, "Lecture notes here.", "abcdefghijk"))
+        self.assertEqual(UserStatistics.objects.get(user=self.user).yt_summaries_generated, 1)
+
+    def test_cached_summary_is_sent_as_one_token(self):
+        self.stream(FakeGemini())
+        model = FakeGemini()
+        events = self.stream(model)
+
+        self.assertEqual(events[1:], [("token", {"text": "Lecture notes here."}), ("done", mock.ANY)])
+        self.assertEqual(model.generations, 0)
+        self.assertEqual(UserStatistics.objects.get(user=self.user).yt_summaries_generated, 2)
+
+    def test_model_error_ends_the_stream_without_saving(self):
+        with self.assertLogs("summarizing.views", "ERROR"):
+            events = self.stream(FakeGemini(error=RuntimeError("quota exceeded")))
+
+        self.assertEqual([event for event, _ in events], ["start", "token", "error"])
+        self.assertEqual(events[-1][1], {"error": "quota exceeded"})
+        self.assertFalse(YouTubeSummary.objects.exists())
+        self.assertEqual(UserStatistics.objects.get(user=self.user).yt_summaries_generated, 0)
+        self.assertIsNone(yt_cache.get_cached_summary(YouTubeTranscript.objects.get()))
+
+    def test_first_event_is_sent_before_the_model_is_called(self):
+        model = FakeGemini()
+        with mock.patch("summarizing.yt_summarizer.get_generative_model", return_value=model):
+            response = self.client.post(reverse("summarize_youtube_video_stream"), {"youtube_url": VIDEO_URL})
+            chunks = iter(response.streaming_content)
+            first = next(chunks)
+            self.assertEqual((model.generations, model.yielded), (0, 0))
+            rest = list(chunks)
+
+        self.assertEqual(parse_events([first]), [("start", {})])
+        self.assertEqual(parse_events(rest)[-1][0], "done")
+
+
+@tag("benchmark")
+@override_settings(YT_SUMMARY_CACHE_ALIAS="default", YT_TRANSCRIPT_LANGUAGES=("en",))
+class YouTubeSummaryStreamBenchmark(MediaRootTestCase):
+    def test_time_to_first_byte(self):
+        UserStatistics.objects.create(user=self.user)
+        YouTubeTranscript.objects.create(video_id="abcdefghijk", language="en", text="transcript text", items=[])
+        # A 2 second generation arriving in 20 chunks
+        chunks = tuple(f"part {index} " for index in range(20))
+
+        yt_cache.get_cache().clear()
+        with mock.patch("summarizing.yt_summarizer.get_generative_model", return_value=FakeGemini(chunks, latency=2)):
+            started = time.perf_counter()
+            self.client.post(reverse("summarize_youtube_video"), {"youtube_url": VIDEO_URL})
+            blocking = time.perf_counter() - started
+
+        yt_cache.get_cache().clear()
+        with mock.patch("summarizing.yt_summarizer.get_generative_model", return_value=FakeGemini(chunks, latency=2)):
+            started = time.perf_counter()
+            response = self.client.post(reverse("summarize_youtube_video_stream"), {"youtube_url": VIDEO_URL})
+            content = iter(response.streaming_content)
+            next(content)
+            first_byte = time.perf_counter() - started
+            next(content)
+            first_token = time.perf_counter() - started
+            list(content)
+            complete = time.perf_counter() - started
+
+        report("YouTube summary with a 2s streamed generation", blocking_ttfb_ms=blocking * 1000,
+               stream_ttfb_ms=first_byte * 1000, stream_first_token_ms=first_token * 1000,
+               stream_complete_ms=complete * 1000)
@@ -0,0 +1,98 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import close_old_connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from user_profile.models import UserStatistics
+from summarizing import yt_cache
+from summarizing.models import YouTubeSummary, YouTubeTranscript
+from summarizing.serializers import YouTubeSummarySerializer
+from .utils import FakeGemini
+
+
+class TranscriptBackfillTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("student", password="secret")
+
+    def legacy_summary(self, url, transcript):
+        return YouTubeSummary.objects.create(user=self.user, youtube_url=url, transcript=transcript, summary="notes")
+
+    def test_legacy_transcripts_move_to_one_shared_row_per_video(self):
+        first = self.legacy_summary("https://www.youtube.com/watch?v=abcdefghijk", "old transcript")
+        second = self.legacy_summary("https://youtu.be/abcdefghijk", "old transcript")
+        broken = self.legacy_summary("https://www.youtube.com/watch", "orphan transcript")
+
+        call_command("backfill_youtube_transcripts", stdout=StringIO())
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        broken.refresh_from_db()
+        self.assertEqual(YouTubeTranscript.objects.count(), 1)
+        self.assertEqual(first.shared_transcript_id, second.shared_transcript_id)
+        self.assertEqual(first.shared_transcript.text, "old transcript")
+        self.assertEqual(first.transcript, "")
+        # Nothing is dropped when the URL has no video ID
+        self.assertIsNone(broken.shared_transcript)
+        self.assertEqual(broken.transcript, "orphan transcript")
+
+    def test_serializer_reads_either_copy(self):
+        legacy = self.legacy_summary("https://youtu.be/abcdefghijk", "old transcript")
+        self.assertEqual(YouTubeSummarySerializer(legacy).data["transcript"], "old transcript")
+
+        call_command("backfill_youtube_transcripts", stdout=StringIO())
+        legacy.refresh_from_db()
+        self.assertEqual(YouTubeSummarySerializer(legacy).data["transcript"], "old transcript")
+
+
+VIDEO_URL = "https://www.youtube.com/watch?v=abcdefghijk"
+
+
+@override_settings(YT_SUMMARY_CACHE_ALIAS="default", YT_TRANSCRIPT_LANGUAGES=("en",))
+class SummaryCoalescingTests(TransactionTestCase):
+    def setUp(self):
+        yt_cache.get_cache().clear()
+        self.users = [User.objects.create_user(f"student{index}", password="secret") for index in range(4)]
+        for user in self.users:
+            UserStatistics.objects.create(user=user)
+        YouTubeTranscript.objects.create(video_id="abcdefghijk", language="en", text="transcript text",
+                                         items=[{"text": "transcript text", "start": 0}])
+        self.model = FakeGemini(latency=0.3)
+        patcher = mock.patch("summarizing.yt_summarizer.get_generative_model", return_value=self.model)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post_concurrently(self, url_name, read):
+        barrier = threading.Barrier(len(self.users), timeout=10)
+
+        def post(user):
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                barrier.wait()
+                return read(client.post(reverse(url_name), {"youtube_url": VIDEO_URL}))
+            finally:
+                close_old_connections()
+
+        with ThreadPoolExecutor(max_workers=len(self.users)) as executor:
+            return list(executor.map(post, self.users))
+
+    def test_concurrent_requests_generate_once(self):
+        summaries = self.post_concurrently("summarize_youtube_video", lambda response: response.data["summary"])
+
+        self.assertEqual(self.model.generations, 1)
+        self.assertEqual(summaries, ["Lecture notes here."] * 4)
+
+    def test_concurrent_streams_generate_once(self):
+        bodies = self.post_concurrently("summarize_youtube_video_stream",
+                                        lambda response: b"".join(response.streaming_content).decode())
+
+        self.assertEqual(self.model.generations, 1)
+        for body in bodies:
+            self.assertIn("event: done", body)
+        self.assertEqual(set(YouTubeSummary.objects.values_list("summary", flat=True)), {"Lecture notes here."})
+        self.assertEqual(YouTubeSummary.objects.count(), 4)
@@ -0,0 +1,85 @@
+import re
+import threading
+import time
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from summarizing import yt_summarizer
+
+
+def transcript_items(count, words_per_item=4):
+    return [{"text": " ".join([f"w{index}"] * words_per_item), "start": index * 10.5, "duration": 10}
+            for index in range(count)]
+
+
+class SectionModel:
+    """Stub model that answers every section prompt with notes naming the section's first item.
+
+    Earlier sections answer more slowly, so they finish after the later ones.
+    """
+
+    def __init__(self):
+        self.prompts = []
+        self.lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        with self.lock:
+            self.prompts.append(prompt)
+        first_item = int(re.search(r"\bw(\d+)\b", prompt).group(1))
+        time.sleep(max(0, 0.2 - first_item * 0.01))
+        return mock.Mock(text=f"notes from item {first_item}")
+
+
+class TranscriptSectionTests(SimpleTestCase):
+    def test_sections_only_break_between_items(self):
+        items = transcript_items(10)  # every item is 11 characters, 12 with the joining space
+        sections = yt_summarizer.chunk_transcript_items(items, max_chars=40)
+
+        self.assertEqual(" ".join(text for _, text in sections), " ".join(item["text"] for item in items))
+        for _, text in sections:
+            self.assertLessEqual(len(text), 40)
+        self.assertEqual([len(text.split()) // 4 for _, text in sections], [3, 3, 3, 1])
+
+    def test_sections_start_at_their_first_item(self):
+        sections = yt_summarizer.chunk_transcript_items(transcript_items(10), max_chars=40)
+        self.assertEqual([start for start, _ in sections], [0, 31.5, 63, 94.5])
+        self.assertEqual(yt_summarizer.format_timestamp(3725.9), "01:02:05")
+
+    def test_item_longer_than_a_section_is_kept_whole(self):
+        items = [{"text": "x" * 100, "start": 0}, {"text": "short", "start": 5}]
+        sections = yt_summarizer.chunk_transcript_items(items, max_chars=40)
+        self.assertEqual(sections, [(0, "x" * 100), (5, "short")])
+
+
+@override_settings(YT_SECTION_CHARS=40, YT_SECTION_MAX_WORKERS=4)
+class SummaryPromptTests(SimpleTestCase):
+    def build(self, items, max_chars):
+        text = " ".join(item["text"] for item in items)
+        model = SectionModel()
+        with mock.patch.object(yt_summarizer, "get_generative_model", return_value=model), \
+                self.settings(YT_SINGLE_SHOT_MAX_CHARS=max_chars):
+            return text, yt_summarizer.build_summary_prompt(text, items), model
+
+    def test_short_transcript_is_summarized_in_one_shot(self):
+        text, prompt, model = self.build(transcript_items(10), max_chars=1000)
+        self.assertEqual(prompt, yt_summarizer.prompt_template + text)
+        self.assertEqual(model.prompts, [])
+
+    def test_transcript_without_items_is_summarized_in_one_shot(self):
+        text = " ".join(item["text"] for item in transcript_items(10))
+        with self.settings(YT_SINGLE_SHOT_MAX_CHARS=10):
+            self.assertEqual(yt_summarizer.build_summary_prompt(text), yt_summarizer.prompt_template + text)
+
+    def test_long_transcript_is_reduced_from_section_notes_in_lecture_order(self):
+        _, prompt, model = self.build(transcript_items(10), max_chars=100)
+
+        self.assertEqual(len(model.prompts), 4)
+        self.assertTrue(prompt.startswith(yt_summarizer.reduce_prompt_template))
+        notes = prompt[len(yt_summarizer.reduce_prompt_template):]
+        self.assertEqual(notes, "\n\n".join([
+            "[00:00:00]\nnotes from item 0",
+            "[00:00:31]\nnotes from item 3",
+            "[00:01:03]\nnotes from item 6",
+            "[00:01:34]\nnotes from item 9",
+        ]))
+        # Every section prompt carries its own timestamp
+        self.assertIn("[00:01:03]\nw6 w6", "".join(model.prompts))
@@ -0,0 +1,121 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+import fitz
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+# Prelude for benchmarks that need a fresh interpreter, so imports and peak RSS are not shared with the test run
+SUBPROCESS_PRELUDE = """
+import json, os, resource, sys, time
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ai_study_generator.settings")
+import django
+django.setup()
+
+def peak_rss_mb():
+    # ru_maxrss survives fork and exec on Linux, so it would report the test runner's peak, VmHWM does not
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+"""
+
+
+def make_pdf(page_count, text="Lecture notes", lines_per_page=30, label=""):
+    """Returns the bytes of a PDF with page_count text pages, every line naming its page."""
+    document = fitz.open()
+    for page_num in range(1, page_count + 1):
+        page = document.new_page()
+        body = "\n".join(f"{label}Page {page_num} line {line}: {text}" for line in range(lines_per_page))
+        page.insert_text((40, 40), body, fontsize=9)
+    data = document.tobytes()
+    document.close()
+    return data
+
+
+def make_upload(data, name="notes.pdf"):
+    return SimpleUploadedFile(name, data, content_type="application/pdf")
+
+
+def run_in_subprocess(code):
+    """Runs code after SUBPROCESS_PRELUDE in a new interpreter and returns the JSON object it prints last."""
+    result = subprocess.run(
+        [sys.executable, "-c", SUBPROCESS_PRELUDE + code],
+        cwd=settings.BASE_DIR,
+        env={**os.environ, "PYTHONPATH": str(Path(settings.BASE_DIR))},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def report(title, **values):
+    """Prints one benchmark result line. Benchmarks are left out of the default run, use `manage.py test --tag benchmark`."""
+    numbers = ", ".join(f"{name}={value:.3f}" if isinstance(value, float) else f"{name}={value}" for name, value in values.items())
+    print(f"\n[benchmark] {title}: {numbers}")
+
+
+class FakeGemini:
+    """Stands in for the Gemini model: counts generations and answers slowly, in chunks when streaming.
+
+    With error set, a stream raises it after its first chunk.
+    """
+
+    def __init__(self, chunks=("Lecture ", "notes ", "here."), latency=0.0, error=None):
+        self.chunks = chunks
+        self.latency = latency
+        self.error = error
+        self.generations = 0
+        self.yielded = 0
+        self.lock = threading.Lock()
+
+    def generate_content(self, prompt, stream=False):
+        with self.lock:
+            self.generations += 1
+        if stream:
+            return self.stream()
+        time.sleep(self.latency)
+        return mock.Mock(text="".join(self.chunks))
+
+    def stream(self):
+        for chunk in self.chunks:
+            time.sleep(self.latency / len(self.chunks))
+            self.yielded += 1
+            yield mock.Mock(text=chunk)
+            if self.error is not None:
+                raise self.error
+
+
+class MediaRootTestCase(TestCase):
+    """Authenticated API client, with uploads stored under a temporary MEDIA_ROOT."""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        overrides = override_settings(MEDIA_ROOT=media_root.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.media_root = media_root.name
+
+        # The reaper runs on its own thread and connection, tests call it directly instead
+        patcher = mock.patch("summarizing.uploads.schedule_reap")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user("student", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
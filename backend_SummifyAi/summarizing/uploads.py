@@ -0,0 +1,88 @@
+import logging
+import os
+import threading
+import time
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from .locks import key_lock
+from .models import PDFSummaryJob
+from .page_cache import hash_pdf_file
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = "pdfs"
+
+_reaper_lock = threading.Lock()
+_last_reap = 0.0
+
+
+def store_upload(pdf_file, content_hash=None):
+    """Keeps one copy of an uploaded PDF under its content hash and returns its storage name."""
+    content_hash = content_hash or hash_pdf_file(pdf_file)
+    name = f"{UPLOAD_DIR}/{content_hash}.pdf"
+
+    with key_lock(f"upload:{name}"):
+        if not default_storage.exists(name):
+            pdf_file.seek(0)
+            name = default_storage.save(name, pdf_file)
+            pdf_file.seek(0)
+        else:
+            touch_upload(name)
+
+    schedule_reap()
+    return name
+
+
+def touch_upload(name):
+    """Marks a retained upload as used now, so the reaper deletes the least recently used uploads first."""
+    try:
+        os.utime(default_storage.path(name))
+    except NotImplementedError:
+        # Storages without local paths keep their upload time, their uploads are reaped oldest first
+        pass
+
+
+def schedule_reap():
+    """Starts a background reaper run, at most once every UPLOAD_REAP_INTERVAL seconds."""
+    global _last_reap
+    with _reaper_lock:
+        if time.monotonic() - _last_reap < getattr(settings, "UPLOAD_REAP_INTERVAL", 300):
+            return
+        _last_reap = time.monotonic()
+    threading.Thread(target=reap_uploads, name="upload-reaper", daemon=True).start()
+
+
+def reap_uploads(max_bytes=None):
+    """Deletes the least recently used uploads until they fit in UPLOAD_MAX_BYTES, returns the deleted names."""
+    if max_bytes is None:
+        max_bytes = getattr(settings, "UPLOAD_MAX_BYTES", 2 * 1024 * 1024 * 1024)
+
+    try:
+        if not default_storage.exists(UPLOAD_DIR):
+            return []
+        _, files = default_storage.listdir(UPLOAD_DIR)
+        names = [f"{UPLOAD_DIR}/{file_name}" for file_name in files]
+        sizes = {name: default_storage.size(name) for name in names}
+        total = sum(sizes.values())
+        if total <= max_bytes:
+            return []
+
+        # Jobs that have not finished still need to read their file
+        in_use = set(PDFSummaryJob.objects.filter(status__in=['pending', 'running']).values_list('pdf_file', flat=True))
+
+        deleted = []
+        for name in sorted(names, key=default_storage.get_modified_time):
+            if total <= max_bytes:
+                break
+            if name in in_use:
+                continue
+            with key_lock(f"upload:{name}"):
+                default_storage.delete(name)
+            total -= sizes[name]
+            deleted.append(name)
+
+        logger.info(f"Upload reaper deleted {len(deleted)} files, {total} bytes retained")
+        return deleted
+    finally:
+        close_old_connections()
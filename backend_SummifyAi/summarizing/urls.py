@@ -1,9 +1,15 @@
 from django.urls import path
-from .views import YouTubeSummaryCreateView, PDFSummarizationView, PDFMindmapView, QuizGeneratorView
+from .views import YouTubeSummaryCreateView, YouTubeSummaryStreamView, PDFSummarizationView, PDFSummaryJobCreateView, PDFSummaryJobDetailView, CacheStatsView, PDFMindmapView, PDFMindmapListView, PDFMindmapDetailView, QuizGeneratorView
 
 urlpatterns = [
     path('yt_summarize/', YouTubeSummaryCreateView.as_view(), name='summarize_youtube_video'),
+    path('yt_summarize/stream/', YouTubeSummaryStreamView.as_view(), name='summarize_youtube_video_stream'),
     path('pdf_summarize/', PDFSummarizationView.as_view(), name='pdf_summarize'),
+    path('pdf_summarize/jobs/', PDFSummaryJobCreateView.as_view(), name='pdf_summary_job_create'),
+    path('pdf_summarize/jobs/<int:pk>/', PDFSummaryJobDetailView.as_view(), name='pdf_summary_job_detail'),
     path('pdf_mindmap/', PDFMindmapView.as_view(), name='pdf_mindmap'),
+    path('pdf_mindmaps/', PDFMindmapListView.as_view(), name='pdf_mindmap_list'),
+    path('pdf_mindmaps/<int:pk>/', PDFMindmapDetailView.as_view(), name='pdf_mindmap_detail'),
+    path('cache_stats/', CacheStatsView.as_view(), name='cache_stats'),
     path('generate-quiz/', QuizGeneratorView.as_view(), name='generate_quiz'),  # For quiz generation (POST)
 ]
@@ -0,0 +1,173 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from django.conf import settings
+from .locks import key_lock
+
+logger = logging.getLogger(__name__)
+
+# Loaded vector stores kept in memory, most recently used last: {index_dir: (vector_store, size)}
+_loaded = OrderedDict()
+_loaded_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def get_index_root():
+    return Path(getattr(settings, "VECTOR_INDEX_ROOT", settings.BASE_DIR / "vector_indexes"))
+
+
+def hash_text_chunks(text_chunks, embedding_name=""):
+    digest = hashlib.sha256(embedding_name.encode("utf-8") + b"\0")
+    for chunk in text_chunks:
+        digest.update(chunk.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def get_index_dir(user, doc_hash):
+    # Every user gets their own directory so one user's documents never leak into another's index
+    return get_index_root() / f"user_{user.id}" / doc_hash
+
+
+def get_or_build_index(user, text_chunks, embeddings):
+    """Returns the directory of the FAISS index for these chunks, building it only the first time."""
+    # Vectors from different embedders are not comparable, so each one gets its own index
+    embedding_name = getattr(embeddings, "model_name", type(embeddings).__name__)
+    index_dir = get_index_dir(user, hash_text_chunks(text_chunks, embedding_name))
+
+    with key_lock(f"vector_index:{index_dir}"):
+        if index_dir.exists():
+            # Bump the mtime so LRU eviction keeps indexes that are still in use
+            os.utime(index_dir)
+            return index_dir
+
+        from langchain_community.vectorstores import FAISS
+
+        index_dir.parent.mkdir(parents=True, exist_ok=True)
+        vector_store = FAISS.from_texts(text_chunks, embedding=embeddings)
+        if hasattr(embeddings, "stats"):
+            logger.info(f"Embedded {index_dir.name}: {embeddings.stats}")
+
+        # Write to a scratch directory first so readers never see a half written index
+        tmp_dir = tempfile.mkdtemp(prefix=".building-", dir=index_dir.parent)
+        vector_store.save_local(tmp_dir)
+        try:
+            os.replace(tmp_dir, index_dir)
+        except OSError:
+            # key_lock only covers this process, another worker process may have built the same index meanwhile
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not index_dir.exists():
+                raise
+
+        # The request that built the index uses it right away, keep it instead of reloading from disk
+        remember_index(index_dir, vector_store)
+
+    evict_indexes()
+    return index_dir
+
+
+def load_index(index_dir, embeddings):
+    """Returns the vector store in index_dir, from memory when possible and from disk otherwise."""
+    index_dir = Path(index_dir)
+    with _loaded_lock:
+        if index_dir in _loaded:
+            _loaded.move_to_end(index_dir)
+            _stats["hits"] += 1
+            return _loaded[index_dir][0]
+        _stats["misses"] += 1
+
+    from langchain_community.vectorstores import FAISS
+
+    vector_store = FAISS.load_local(str(index_dir), embeddings, allow_dangerous_deserialization=True)
+    remember_index(index_dir, vector_store)
+    return vector_store
+
+
+def remember_index(index_dir, vector_store):
+    """Keeps a loaded vector store in memory, evicting the least recently used ones past VECTOR_STORE_CACHE_MAX_BYTES."""
+    max_bytes = getattr(settings, "VECTOR_STORE_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+    # The serialized index is a close estimate of what the loaded store holds in memory
+    size = dir_size(Path(index_dir))
+
+    with _loaded_lock:
+        _loaded[Path(index_dir)] = (vector_store, size)
+        _loaded.move_to_end(Path(index_dir))
+        total = sum(size for _, size in _loaded.values())
+        while total > max_bytes and len(_loaded) > 1:
+            _, (_, evicted_size) = _loaded.popitem(last=False)
+            total -= evicted_size
+            _stats["evictions"] += 1
+
+
+def forget_index(index_dir):
+    with _loaded_lock:
+        _loaded.pop(Path(index_dir), None)
+
+
+def get_cache_stats():
+    with _loaded_lock:
+        return {
+            **_stats,
+            "entries": len(_loaded),
+            "bytes": sum(size for _, size in _loaded.values()),
+        }
+
+
+def dir_size(path):
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def evict_indexes(max_bytes=None):
+    """Deletes the least recently used indexes until the store fits in VECTOR_INDEX_MAX_BYTES."""
+    if max_bytes is None:
+        max_bytes = getattr(settings, "VECTOR_INDEX_MAX_BYTES", 1024 * 1024 * 1024)
+
+    root = get_index_root()
+    if not root.exists():
+        return []
+
+    indexes = [index_dir for user_dir in root.iterdir() if user_dir.is_dir() for index_dir in user_dir.iterdir()
+               if index_dir.is_dir() and not index_dir.name.startswith(".")]
+    sizes = {index_dir: dir_size(index_dir) for index_dir in indexes}
+    total = sum(sizes.values())
+
+    evicted = []
+    for index_dir in sorted(indexes, key=lambda index_dir: index_dir.stat().st_mtime):
+        if total <= max_bytes:
+            break
+        with key_lock(f"vector_index:{index_dir}"):
+            shutil.rmtree(index_dir, ignore_errors=True)
+            forget_index(index_dir)
+        total -= sizes[index_dir]
+        evicted.append(index_dir)
+    return evicted
+
+
+def estimate_tokens(text_chunks):
+    # Roughly four characters per token for English text
+    return sum(len(chunk) for chunk in text_chunks) // 4
+
+
+def get_context_documents(user, text_chunks, query):
+    """Returns the documents to answer query with: every chunk when they fit the model context, top-k retrieval otherwise."""
+    from langchain_core.documents import Document
+    from .embeddings import get_embeddings
+
+    started = time.perf_counter()
+    if estimate_tokens(text_chunks) <= getattr(settings, "CONTEXT_STUFF_MAX_TOKENS", 6000):
+        strategy = "stuff"
+        docs = [Document(page_content=chunk) for chunk in text_chunks]
+    else:
+        strategy = "retrieval"
+        embeddings = get_embeddings()
+        index_dir = get_or_build_index(user, text_chunks, embeddings)
+        docs = load_index(index_dir, embeddings).similarity_search(query)
+
+    logger.info(f"Context strategy {strategy} for {len(text_chunks)} chunks took {time.perf_counter() - started:.3f}s")
+    return docs
@@ -1,41 +1,39 @@
 from rest_framework import generics, status
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from .models import YouTubeSummary
-from .serializers import YouTubeSummarySerializer,GeneratedQuizSerializer
-from .yt_summarizer import extract_transcript_details, generate_gemini_content
+from .serializers import YouTubeSummarySerializer,GeneratedQuizSerializer,PDFSummaryJobSerializer,PDFMindMapSerializer,PDFMindMapListSerializer
+from rest_framework.pagination import PageNumberPagination
+from .yt_cache import get_shared_transcript, get_shared_summary, stream_shared_summary
+from django.http import StreamingHttpResponse
 from rest_framework.parsers import MultiPartParser
 from rest_framework import status
-from .pdf_summarizer import pdf_to_images, process_image_with_vision_model,get_vector_store, get_conversational_chain, user_input  # Import your functions
+from .page_cache import get_cache_stats as get_page_cache_stats, hash_pdf_file
+from .vector_store import get_cache_stats as get_vector_store_cache_stats
+from .pdf_summarizer import summarize_pdf, get_conversational_chain, user_input  # Import your functions
 from rest_framework.views import APIView
-from .models import PDFSummary,GeneratedQuiz
+from .models import PDFSummary,GeneratedQuiz,PDFSummaryJob,PDFMindMap
+from .jobs import save_pdf_summary, submit_pdf_summary_job, claim_pregenerated_quiz, schedule_quiz_pool
 from rest_framework import response
 import logging
-from django.core.files.storage import default_storage
+from .uploads import store_upload
 from django.contrib.auth.models import User
-from .mind_map import get_pdf_text, get_text_chunks, get_vector_store, generate_mindmap
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from .mind_map import iter_pdf_page_texts, iter_text_chunks, generate_mindmap, get_mindmap_version
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_groq import ChatGroq
-from langchain.vectorstores import FAISS
-from langchain.chains.question_answering import load_qa_chain
-from langchain.prompts import PromptTemplate
-import os
-from dotenv import load_dotenv
-import google.generativeai as genai
+from .vector_store import get_context_documents, get_or_build_index, estimate_tokens
+from .clients import get_qa_chain, get_text_splitter
+from .quiz_parser import parse_quiz, MCQ_KEY, TF_KEY
 from user_profile.models import UserContribution,UserStatistics
 import json
+import math
 import re
+from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
+from django.conf import settings
 
 
-load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
-genai.configure(api_key=api_key)
-groq_api_key = os.getenv("GROQ_API_KEY")
 
 class QuizGeneratorView(APIView):
     permission_classes = [IsAuthenticated]
@@ -52,23 +50,23 @@ class QuizGeneratorView(APIView):
         system_summary = pdf_summary.summary
         print(f"System Summary: {system_summary}")  # Log the retrieved summary
 
-        text_chunks = self.get_text_chunks(system_summary)
-        self.get_vector_store(text_chunks)
-
-        # Generate quiz
-        user_question = self.get_quiz_generation_prompt()
-
         try:
-            quiz_json = self.user_input(user_question)
-            # Parse the JSON string to ensure it's valid before saving
-            quiz_data = json.loads(quiz_json)
-            
-            # Save the generated quiz to the database
-            generated_quiz = GeneratedQuiz.objects.create(
-                user=request.user,
-                pdf_summary=pdf_summary,
-                quiz_data=quiz_json
-            )
+            # Serve a pre-generated quiz when one is waiting, generate one otherwise
+            generated_quiz = claim_pregenerated_quiz(pdf_summary)
+            if generated_quiz is None:
+                quiz_json = self.generate_quiz(system_summary, request.user)
+
+                # Save the generated quiz to the database
+                generated_quiz = GeneratedQuiz.objects.create(
+                    user=request.user,
+                    pdf_summary=pdf_summary,
+                    quiz_data=quiz_json
+                )
+            # Parse the JSON string to ensure it's valid before returning it
+            quiz_data = json.loads(generated_quiz.quiz_data)
+
+            # Top the pool back up for the next request
+            schedule_quiz_pool(pdf_summary.id)
 
             UserContribution.objects.create(user=request.user, contribution_type='test')
             
@@ -87,17 +85,17 @@ class QuizGeneratorView(APIView):
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     def get_text_chunks(self, text):
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=1000)
+        text_splitter = get_text_splitter(chunk_size=10000, chunk_overlap=1000)
         return text_splitter.split_text(text)
 
-    def get_vector_store(self, text_chunks):
-        embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-        vector_store = FAISS.from_texts(text_chunks, embedding=embeddings)
-        vector_store.save_local("faiss_index_quiz_summary")
+    mcq_count = 15
+    true_false_count = 5
 
-    def get_quiz_generation_prompt(self):
-        return """Please generate 15 multiple-choice questions in JSON format. Each question should include the question text, four options (labeled A, B, C, and D), and the correct option. Additionally, include five True or False questions where each question has options (True/False) and the correct answer. The JSON structure should look like this:
-        {
+    def get_quiz_generation_prompt(self, mcq_count=None, true_false_count=None):
+        mcq_count = mcq_count or self.mcq_count
+        true_false_count = true_false_count or self.true_false_count
+        return f"""Please generate {mcq_count} multiple-choice questions in JSON format. Each question should include the question text, four options (labeled A, B, C, and D), and the correct option. Additionally, include {true_false_count} True or False questions where each question has options (True/False) and the correct answer. The JSON structure should look like this:
+        """ + """{
             "multiple_choice_questions": [
                 {
                     "question": "Question text here?",
@@ -126,82 +124,89 @@ class QuizGeneratorView(APIView):
 
     logger = logging.getLogger(__name__)
 
-    def extract_and_parse_json(self, text):
-        # Find the outermost braces
-        start = text.find('{')
-        end = text.rfind('}')
-        
-        if start == -1 or end == -1:
-            raise ValueError("No JSON-like structure found in the response.")
-        
-        # Extract the content between the outermost braces
-        json_str = text[start:end+1]
-        
-        # Clean the extracted JSON string
-        cleaned_json = self.clean_json(json_str)
-        
+    def generate_quiz(self, summary, user):
+        """Returns the quiz JSON string, sharded across concurrent calls when QUIZ_SHARDS is above 1."""
+        shards = self.get_quiz_shards(summary)
+        if len(shards) > 1:
+            return self.generate_sharded_quiz(shards)
+        return self.user_input(self.get_quiz_generation_prompt(), self.get_text_chunks(summary), user)
+
+    def prepare_context(self, summary, user):
+        """Builds the retrieval index a single-call quiz of summary would need, returns whether one was needed.
+
+        Sharded quizzes send every shard whole and short summaries are stuffed into the prompt, neither
+        uses an index.
+        """
+        from .embeddings import get_embeddings
+
+        if len(self.get_quiz_shards(summary)) > 1:
+            return False
+        text_chunks = self.get_text_chunks(summary)
+        if estimate_tokens(text_chunks) <= getattr(settings, "CONTEXT_STUFF_MAX_TOKENS", 6000):
+            return False
+        get_or_build_index(user, text_chunks, get_embeddings())
+        return True
+
+    def get_quiz_shards(self, summary):
+        shard_count = getattr(settings, "QUIZ_SHARDS", 1)
+        if shard_count <= 1:
+            return [summary]
+
+        # Split into sections, then group consecutive sections so every shard covers a part of the summary
+        sections = get_text_splitter(chunk_size=getattr(settings, "QUIZ_SHARD_CHARS", 2000), chunk_overlap=0).split_text(summary)
+        shard_count = min(shard_count, len(sections))
+        size = math.ceil(len(sections) / shard_count) if sections else 1
+        return ["\n".join(sections[i:i + size]) for i in range(0, len(sections), size)]
+
+    def generate_shard(self, shard, mcq_count, true_false_count):
+        from langchain_core.documents import Document
+
+        question = self.get_quiz_generation_prompt(mcq_count, true_false_count)
+        response = self.get_conversational_chain()(
+            {"input_documents": [Document(page_content=shard)], "question": question},
+            return_only_outputs=True
+        )
         try:
-            # Try to parse it
-            return json.loads(cleaned_json)
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON decode error: {e}")
-            # If parsing fails, try to salvage what we can
-            return self.salvage_json(cleaned_json)
-
-    def clean_json(self, raw_json):
-        # Replace single quotes with double quotes
-        raw_json = raw_json.replace("'", '"')
-        
-        # Ensure all keys are properly quoted
-        raw_json = re.sub(r'(\w+)(?=\s*:)', r'"\1"', raw_json)
-        
-        # Remove any trailing commas before closing brackets or braces
-        raw_json = re.sub(r',\s*([\]}])', r'\1', raw_json)
-        
-        return raw_json
+            return self.extract_and_parse_json(response.get("output_text", ""))
+        except ValueError as e:
+            logger.error(f"Quiz shard could not be parsed: {e}")
+            return {MCQ_KEY: [], TF_KEY: []}
+
+    def generate_sharded_quiz(self, shards):
+        # Ask every shard for a little more than its share so de-duplication still leaves enough questions
+        mcq_per_shard = math.ceil(self.mcq_count / len(shards)) + 1
+        true_false_per_shard = math.ceil(self.true_false_count / len(shards)) + 1
+
+        max_workers = getattr(settings, "QUIZ_SHARD_MAX_WORKERS", 4)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(
+                lambda shard: self.generate_shard(shard, mcq_per_shard, true_false_per_shard), shards
+            ))
+
+        # Take the shards' questions round-robin so trimming to the limit still covers the whole summary
+        quiz = {}
+        for key, text_field, limit in ((MCQ_KEY, "question", self.mcq_count), (TF_KEY, "statement", self.true_false_count)):
+            seen = set()
+            quiz[key] = []
+            for questions in zip_longest(*(result[key] for result in results)):
+                for question in filter(None, questions):
+                    normalized = re.sub(r"\W+", " ", question[text_field]).strip().lower()
+                    if normalized not in seen:
+                        seen.add(normalized)
+                        quiz[key].append(question)
+            quiz[key] = quiz[key][:limit]
+
+        if not quiz[MCQ_KEY] and not quiz[TF_KEY]:
+            raise ValueError("Generated quiz data is not valid JSON and could not be repaired.")
+        return json.dumps(quiz)
 
-    def salvage_json(self, text):
-        # Try to salvage as much of the JSON structure as possible
-        questions = []
-        
-        # Extract multiple choice questions
-        mcq_pattern = r'"question"\s*:\s*"([^"]+)".*?"options"\s*:\s*\{([^}]+)\}.*?"correct_option"\s*:\s*"([^"]+)"'
-        mcq_matches = re.finditer(mcq_pattern, text, re.DOTALL)
-        
-        for match in mcq_matches:
-            question, options_str, correct_option = match.groups()
-            options = {}
-            for opt in re.finditer(r'"([A-D])"\s*:\s*"([^"]+)"', options_str):
-                options[opt.group(1)] = opt.group(2)
-            
-            questions.append({
-                "question": question,
-                "options": options,
-                "correct_option": correct_option
-            })
-        
-        # Extract true/false questions
-        tf_pattern = r'"statement"\s*:\s*"([^"]+)".*?"options"\s*:\s*\{([^}]+)\}.*?"correct_option"\s*:\s*"(True|False)"'
-        tf_matches = re.finditer(tf_pattern, text, re.DOTALL)
-        
-        for match in tf_matches:
-            statement, options_str, correct_option = match.groups()
-            
-            questions.append({
-                "statement": statement,
-                "options": {"True": "True", "False": "False"},
-                "correct_option": correct_option
-            })
-        
-        if questions:
-            return {"questions": questions}
-        else:
-            raise ValueError("No valid questions could be extracted from the response.")
+    def extract_and_parse_json(self, text):
+        # Tolerant single-pass parse with schema validation, see quiz_parser.parse_quiz
+        return parse_quiz(text)
 
-    def user_input(self, user_question):
-        embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-        new_db = FAISS.load_local("faiss_index_quiz_summary", embeddings, allow_dangerous_deserialization=True)
-        docs = new_db.similarity_search(user_question)
+    def user_input(self, user_question, text_chunks, user):
+        # Short summaries are stuffed into the prompt whole, long ones go through the vector store
+        docs = get_context_documents(user, text_chunks, user_question)
 
         chain = self.get_conversational_chain()
 
@@ -228,8 +233,7 @@ class QuizGeneratorView(APIView):
             logger.error(f"Error extracting and parsing JSON: {e}")
             raise ValueError("Generated quiz data is not valid JSON and could not be repaired.")
 
-    def get_conversational_chain(self):
-        prompt_template = """
+    quiz_prompt_template = """
         You are a Quiz generator LLM based on the context.
         Answer the question as detailed as possible from the provided context, make sure to provide all the details, if the answer is not in
         provided context just say, "answer is not available in the context", don't provide the wrong answer\n\n
@@ -238,9 +242,10 @@ class QuizGeneratorView(APIView):
 
         Answer:
         """
-        model = ChatGroq(model_name="llama-3.1-70b-versatile", temperature=0.35)
-        prompt = PromptTemplate(template=prompt_template, input_variables=["context", "question"])
-        return load_qa_chain(model, chain_type="stuff", prompt=prompt)
+
+    def get_conversational_chain(self):
+        # Built once per process and shared, so the Groq connection pool is reused across requests
+        return get_qa_chain(self.quiz_prompt_template)
 
     
     
@@ -252,14 +257,14 @@ class YouTubeSummaryCreateView(generics.CreateAPIView):
     def perform_create(self, serializer):
         youtube_url = serializer.validated_data.get('youtube_url')
         
-        # Extract transcript from YouTube
-        transcript = extract_transcript_details(youtube_url)
+        # Extract transcript from YouTube, shared across users
+        transcript = get_shared_transcript(youtube_url)
 
-        # Generate summary using Google Gemini
-        summary = generate_gemini_content(transcript)
+        # Generate summary using Google Gemini, reused while it is cached
+        summary = get_shared_summary(transcript)
 
         # Save the object in the database with the user
-        instance = serializer.save(user=self.request.user, transcript=transcript, summary=summary)
+        instance = serializer.save(user=self.request.user, shared_transcript=transcript, summary=summary)
         return instance  # Return the instance for access later
 
     def post(self, request, *args, **kwargs):
@@ -281,62 +286,140 @@ class YouTubeSummaryCreateView(generics.CreateAPIView):
 
 
 
+class YouTubeSummaryStreamView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = YouTubeSummarySerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(
+            self.stream_summary(serializer, request.user), content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+        return response
+
+    def sse_event(self, event, data):
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    def stream_summary(self, serializer, user):
+        # Send something right away so the client gets its first byte before the transcript fetch
+        yield self.sse_event('start', {})
+        try:
+            youtube_url = serializer.validated_data.get('youtube_url')
+            transcript = get_shared_transcript(youtube_url)
+
+            # Generated once per video, concurrent requests replay the cached summary
+            chunks = []
+            for chunk in stream_shared_summary(transcript):
+                chunks.append(chunk)
+                yield self.sse_event('token', {'text': chunk})
+            summary = "".join(chunks)
+
+            # Persist the full text once the stream has finished
+            instance = serializer.save(user=user, shared_transcript=transcript, summary=summary)
+            user_statistics = UserStatistics.objects.get(user=user)
+            user_statistics.yt_summaries_generated += 1
+            user_statistics.save()
+            yield self.sse_event('done', {'id': instance.id})
+        except Exception as e:
+            logger.error(f"Error streaming YouTube summary: {e}")
+            yield self.sse_event('error', {'error': str(e)})
+
+
 logger = logging.getLogger(__name__)
 
+def get_pdf_page_range(request):
+    """Validates the uploaded PDF and page range, returns (file, start_page, end_page, error_response)."""
+    print("Received request data:", request.data)  # Debugging line
+    file = request.FILES.get('pdf_file')  # Updated key to 'pdf_file'
+    
+    if file is None:
+        print("File is None")  # Debugging line
+        return None, None, None, Response({'error': 'No file uploaded. Please upload a PDF file.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    start_page = request.data.get('start_page_number')
+    end_page = request.data.get('end_page_number')
+
+    if start_page is None or end_page is None:
+        return None, None, None, Response({'error': 'Please provide both start_page_number and end_page_number.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        start_page = int(start_page)
+        end_page = int(end_page)
+    except ValueError:
+        return None, None, None, Response({'error': 'Start and end page numbers must be valid integers.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if start_page < 1 or end_page < 1 or end_page < start_page:
+        return None, None, None, Response({'error': 'Invalid page numbers. Ensure start_page is less than or equal to end_page.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return file, start_page, end_page, None
+
+
 class PDFSummarizationView(APIView):
     def post(self, request):
-        print("Received request data:", request.data)  # Debugging line
-        file = request.FILES.get('pdf_file')  # Updated key to 'pdf_file'
-        
-        if file is None:
-            print("File is None")  # Debugging line
-            return Response({'error': 'No file uploaded. Please upload a PDF file.'}, status=status.HTTP_400_BAD_REQUEST)
+        file, start_page, end_page, error_response = get_pdf_page_range(request)
+        if error_response is not None:
+            return error_response
 
-        start_page = request.data.get('start_page_number')
-        end_page = request.data.get('end_page_number')
+        summaries, page_stats = summarize_pdf(file, start_page, end_page)
+        logger.info(f"PDF summarization page stats: {page_stats}")
+        if not summaries and page_stats['failed_pages']:
+            return Response({'error': 'The model did not answer for any page, please try again.', 'page_stats': page_stats},
+                            status=status.HTTP_502_BAD_GATEWAY)
 
-        if start_page is None or end_page is None:
-            return Response({'error': 'Please provide both start_page_number and end_page_number.'}, status=status.HTTP_400_BAD_REQUEST)
+        save_pdf_summary(request.user, store_upload(file), start_page, end_page, summaries)
 
-        try:
-            start_page = int(start_page)
-            end_page = int(end_page)
-        except ValueError:
-            return Response({'error': 'Start and end page numbers must be valid integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'summaries': summaries, 'page_stats': page_stats}, status=status.HTTP_201_CREATED)
 
-        if start_page < 1 or end_page < 1 or end_page < start_page:
-            return Response({'error': 'Invalid page numbers. Ensure start_page is less than or equal to end_page.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        images = pdf_to_images(file)
-        total_pages = len(images)
-        requested_pages = range(start_page, min(end_page + 1, total_pages + 1))
+class PDFSummaryJobCreateView(APIView):
+    def post(self, request):
+        file, start_page, end_page, error_response = get_pdf_page_range(request)
+        if error_response is not None:
+            return error_response
 
-        summaries = {}
-        for page_num in requested_pages:
-            image = images[page_num - 1]  # Convert 1-indexed page number to 0-indexed
-            summaries[page_num] = process_image_with_vision_model(image)
+        # Rendering and model calls happen on the job workers, not in this request
+        job = submit_pdf_summary_job(request.user, file, start_page, end_page)
+        return Response({'job_id': job.id, 'status': job.status}, status=status.HTTP_202_ACCEPTED)
 
-        summary_text = "\n".join([f"Page {num}: {summ}" for num, summ in summaries.items()])
-        
-        # Save the summary with start and end page numbers
-        pdf_summary = PDFSummary(
-            user=request.user,  # Ensure you're getting the user from the request
-            pdf_file=file,
-            start_page_number=start_page,
-            end_page_number=end_page,
-            summary=summary_text
-        )
-        pdf_summary.save()
-        UserContribution.objects.create(user=request.user, contribution_type='pdf_summary')
-        
-                # Increment the pdfs_summarized count in UserStatistics
-        user_statistics = UserStatistics.objects.get(user=request.user)
-        user_statistics.pdfs_summarized += 1
-        user_statistics.save()
 
-        return Response({'summaries': summaries}, status=status.HTTP_201_CREATED)
-    
+class PDFSummaryJobDetailView(generics.RetrieveAPIView):
+    serializer_class = PDFSummaryJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return PDFSummaryJob.objects.filter(user=self.request.user)
+
+    def retrieve(self, request, *args, **kwargs):
+        data = self.get_serializer(self.get_object()).data
+
+        # ?after=<page> only returns pages finished after the ones the client already has
+        after = request.query_params.get('after')
+        if after is not None:
+            try:
+                after = int(after)
+            except ValueError:
+                return Response({'error': 'after must be a valid integer.'}, status=status.HTTP_400_BAD_REQUEST)
+            data['page_summaries'] = {
+                page_num: summary for page_num, summary in data['page_summaries'].items() if int(page_num) > after
+            }
+        return Response(data, status=status.HTTP_200_OK)
+
+
+
+
+class CacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
 
+    def get(self, request):
+        # Process-wide hit/miss counters for the per-page summary cache and the loaded vector stores
+        return Response({
+            'pdf_pages': get_page_cache_stats(),
+            'vector_stores': get_vector_store_cache_stats(),
+        }, status=status.HTTP_200_OK)
 
         
 class PDFMindmapView(APIView):
@@ -348,41 +431,63 @@ class PDFMindmapView(APIView):
         if not pdf_file:
             return Response({'error': 'No file uploaded'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Save the PDF file temporarily for processing
-        file_path = default_storage.save(pdf_file.name, pdf_file)
+        # A PDF that was already mind-mapped the same way is served from the database
+        content_hash = hash_pdf_file(pdf_file)
+        mindmap_version = get_mindmap_version()
+        stored = PDFMindMap.objects.filter(content_hash=content_hash, mindmap_version=mindmap_version).order_by('-created_at')
+        existing = next((mindmap for mindmap in stored.iterator() if mindmap.mindmap_json.get('nodes')), None)
+        if existing is not None:
+            # The reaper may have deleted the retained copy since, and a hit marks it as recently used
+            pdf_file_name = store_upload(pdf_file, content_hash)
+            if existing.user_id != request.user.id:
+                # Give this user their own history entry without generating anything
+                existing = PDFMindMap.objects.create(
+                    user=request.user, pdf_file=pdf_file_name, content_hash=content_hash,
+                    mindmap_version=mindmap_version, mindmap_json=existing.mindmap_json
+                )
+            return Response({'id': existing.id, 'mindmap': existing.mindmap_json}, status=status.HTTP_200_OK)
+
+        # Extract the text straight from the upload page by page and split it into chunks as it streams in,
+        # the chunks are read lazily while the mind map is generated
+        text_chunks = iter_text_chunks(iter_pdf_page_texts(pdf_file))
+
+        # Generate the mind map tree for the whole document
+        try:
+            mindmap_json = generate_mindmap(text_chunks, request.user)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        if not mindmap_json.get('nodes'):
+            return Response({'error': 'The model did not return a mind map, please try again.'},
+                            status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+        # Retained uploads are content-addressed, so the same PDF is only ever stored once
+        mindmap = PDFMindMap.objects.create(
+            user=request.user, pdf_file=store_upload(pdf_file, content_hash), content_hash=content_hash,
+            mindmap_version=mindmap_version, mindmap_json=mindmap_json
+        )
 
-        # Extract the text from the uploaded PDF
-        with default_storage.open(file_path, 'rb') as pdf_file:
-            raw_text = get_pdf_text([pdf_file])  # Pass as a list to maintain compatibility
+        # Return the generated mind map as JSON
+        return Response({'id': mindmap.id, 'mindmap': mindmap_json}, status=status.HTTP_200_OK)
 
-        # Split the text into chunks and generate vector store
-        text_chunks = get_text_chunks(raw_text)
-        get_vector_store(text_chunks)
 
-        # Query the LLM to generate the mind map in JSON format
-        user_query = """Generate a mind map of the document in JSON format. 
-        Here's an example of the expected output:
-        {
-            "title": "Document Title",
-            "nodes": [
-                {
-                    "id": "1",
-                    "text": "Main Topic",
-                    "nodes": [
-                        {
-                            "id": "1.1",
-                            "text": "Subtopic 1"
-                        },
-                        {
-                            "id": "1.2",
-                            "text": "Subtopic 2"
-                        }
-                    ]
-                }
-            ]
-        }"""
+class MindmapPagination(PageNumberPagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
 
-        mindmap_json = generate_mindmap(user_query)  # Call your function to generate the mind map
 
-        # Return the generated mind map as JSON
-        return Response({'mindmap': mindmap_json}, status=status.HTTP_200_OK)
\ No newline at end of file
+class PDFMindmapListView(generics.ListAPIView):
+    serializer_class = PDFMindMapListSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = MindmapPagination
+
+    def get_queryset(self):
+        return PDFMindMap.objects.filter(user=self.request.user).order_by('-created_at')
+
+
+class PDFMindmapDetailView(generics.RetrieveAPIView):
+    serializer_class = PDFMindMapSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return PDFMindMap.objects.filter(user=self.request.user)
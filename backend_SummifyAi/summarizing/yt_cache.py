@@ -0,0 +1,96 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from .locks import key_lock
+from .models import YouTubeTranscript
+from .yt_summarizer import extract_video_id, fetch_transcript_items, generate_gemini_content, generate_gemini_content_stream
+
+# Bump this whenever yt_summarizer.prompt_template changes so stale summaries are not served
+PROMPT_VERSION = "v2"
+
+
+def get_languages():
+    return tuple(getattr(settings, "YT_TRANSCRIPT_LANGUAGES", ("en",)))
+
+
+def get_cache():
+    return caches[getattr(settings, "YT_SUMMARY_CACHE_ALIAS", "default")]
+
+
+def get_shared_transcript(youtube_url):
+    """Returns the shared YouTubeTranscript for a video, fetching it once for all concurrent requests."""
+    video_id = extract_video_id(youtube_url)
+    languages = get_languages()
+    language = ",".join(languages)
+    ttl = timedelta(seconds=getattr(settings, "YT_TRANSCRIPT_TTL", 60 * 60 * 24 * 7))
+
+    def fresh(transcript):
+        return transcript is not None and transcript.fetched_at >= timezone.now() - ttl
+
+    transcript = YouTubeTranscript.objects.filter(video_id=video_id, language=language).first()
+    if fresh(transcript):
+        return transcript
+
+    with key_lock(f"yt_transcript:{video_id}:{language}"):
+        # Another request may have fetched it while we were waiting
+        transcript = YouTubeTranscript.objects.filter(video_id=video_id, language=language).first()
+        if fresh(transcript):
+            return transcript
+
+        items = fetch_transcript_items(video_id, languages)
+        transcript, _ = YouTubeTranscript.objects.update_or_create(
+            video_id=video_id,
+            language=language,
+            defaults={"text": " ".join(item["text"] for item in items), "items": items},
+        )
+        return transcript
+
+
+def summary_key(transcript):
+    return f"yt_summary:{PROMPT_VERSION}:{transcript.video_id}:{transcript.language}"
+
+
+def get_cached_summary(transcript):
+    return get_cache().get(summary_key(transcript))
+
+
+def cache_summary(transcript, summary):
+    get_cache().set(summary_key(transcript), summary, getattr(settings, "YT_SUMMARY_TTL", 60 * 60 * 24 * 7))
+
+
+def get_shared_summary(transcript):
+    """Returns the summary of a shared transcript, generating it once for all concurrent requests."""
+    summary = get_cached_summary(transcript)
+    if summary is not None:
+        return summary
+
+    with key_lock(summary_key(transcript)):
+        summary = get_cached_summary(transcript)
+        if summary is None:
+            summary = generate_gemini_content(transcript.text, transcript.items)
+            cache_summary(transcript, summary)
+        return summary
+
+
+def stream_shared_summary(transcript):
+    """Yields the summary of a shared transcript as it is generated, generating it once for all concurrent requests.
+
+    Requests that arrive while another one is generating wait for it and get the cached summary as a single chunk.
+    """
+    summary = get_cached_summary(transcript)
+    if summary is not None:
+        yield summary
+        return
+
+    with key_lock(summary_key(transcript)):
+        summary = get_cached_summary(transcript)
+        if summary is not None:
+            yield summary
+            return
+
+        chunks = []
+        for chunk in generate_gemini_content_stream(transcript.text, transcript.items):
+            chunks.append(chunk)
+            yield chunk
+        cache_summary(transcript, "".join(chunks))
@@ -1,14 +1,11 @@
-import os
+import re
 from youtube_transcript_api import YouTubeTranscriptApi
-import google.generativeai as genai
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from .clients import get_generative_model
 
-load_dotenv()  # Load environment variables
-
-# Google Gemini model setup
-api_key = os.getenv("GOOGLE_API_KEY")
-genai.configure(api_key=api_key)
-model = genai.GenerativeModel(model_name="gemini-1.5-flash")
+# Google Gemini model setup, the client is created on first use
+MODEL_NAME = "gemini-1.5-flash"
 
 
 # Prompt to generate notes
@@ -16,11 +13,24 @@ prompt_template="""You are Yotube video lecture explainer . You will be taking t
 and explaining me the lecture as i have exam tommorow u would need to explain me things extra if that is not explained in the video clearly.
 The transcript of the video may not be a detail explanation of the video so you have to give me all the necessary information formulas related to the lecture"""
 
+VIDEO_ID_PATTERN = re.compile(r"(?:v=|youtu\.be/|/shorts/|/embed/|/live/)([A-Za-z0-9_-]{11})")
+
+# Normalize any of the usual YouTube URL shapes to the 11 character video ID
+def extract_video_id(youtube_video_url):
+    match = VIDEO_ID_PATTERN.search(youtube_video_url)
+    if not match:
+        raise ValueError(f"Could not find a YouTube video ID in {youtube_video_url}")
+    return match.group(1)
+
+# Fetch the raw transcript items ({"text", "start", "duration"}) of a video
+def fetch_transcript_items(video_id, languages=("en",)):
+    return YouTubeTranscriptApi.get_transcript(video_id, languages=list(languages))
+
 # Extract transcript details from the YouTube video
 def extract_transcript_details(youtube_video_url):
     try:
-        video_id = youtube_video_url.split("v=")[1]  # Extract video ID from the URL
-        transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
+        video_id = extract_video_id(youtube_video_url)
+        transcript_list = fetch_transcript_items(video_id)
 
         # Combine all transcript chunks into one text
         transcript = " ".join([item["text"] for item in transcript_list])
@@ -30,11 +40,69 @@ def extract_transcript_details(youtube_video_url):
     except Exception as e:
         raise e
 
+# Prompts for long transcripts: every section is summarized on its own, then the notes are merged
+section_prompt_template = """You are Yotube video lecture explainer . You will be given one section of a long lecture transcript,
+starting at the timestamp shown. Write detailed study notes for this section only, keep every formula, definition and
+example that is mentioned and keep the timestamp at the top of your notes.
+"""
+
+reduce_prompt_template = prompt_template + """
+The lecture was too long to read at once, so below are detailed notes of its consecutive sections, each with the
+timestamp it starts at. Merge them into one explanation of the whole lecture without dropping formulas or examples.
+"""
+
+def format_timestamp(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+# Split transcript items into sections of roughly max_chars, only breaking between items
+def chunk_transcript_items(transcript_items, max_chars):
+    chunks = []
+    texts, size, start = [], 0, 0
+    for item in transcript_items:
+        if texts and size + len(item["text"]) > max_chars:
+            chunks.append((start, " ".join(texts)))
+            texts, size = [], 0
+        if not texts:
+            start = item.get("start", 0)
+        texts.append(item["text"])
+        size += len(item["text"]) + 1
+    if texts:
+        chunks.append((start, " ".join(texts)))
+    return chunks
+
+# Map stage: summarize the transcript sections concurrently, returns the notes in lecture order
+def summarize_transcript_sections(transcript_items):
+    chunks = chunk_transcript_items(transcript_items, getattr(settings, "YT_SECTION_CHARS", 20000))
+
+    def summarize_section(chunk):
+        start, text = chunk
+        response = get_generative_model(MODEL_NAME).generate_content(f"{section_prompt_template}\n[{format_timestamp(start)}]\n{text}")
+        return f"[{format_timestamp(start)}]\n{response.text}"
+
+    with ThreadPoolExecutor(max_workers=getattr(settings, "YT_SECTION_MAX_WORKERS", 4)) as executor:
+        return "\n\n".join(executor.map(summarize_section, chunks))
+
+# Short transcripts are summarized in a single shot, long ones through a map-reduce over their sections
+def build_summary_prompt(transcript_text, transcript_items=None):
+    single_shot_max_chars = getattr(settings, "YT_SINGLE_SHOT_MAX_CHARS", 60000)
+    if not transcript_items or len(transcript_text) <= single_shot_max_chars:
+        return prompt_template + transcript_text
+    return reduce_prompt_template + summarize_transcript_sections(transcript_items)
+
 # Generate content summary from the transcript using Google Gemini
-def generate_gemini_content(transcript_text):
+def generate_gemini_content(transcript_text, transcript_items=None):
     try:
-        prompt = prompt_template + transcript_text
-        response = model.generate_content(prompt)
+        prompt = build_summary_prompt(transcript_text, transcript_items)
+        response = get_generative_model(MODEL_NAME).generate_content(prompt)
         return response.text
     except Exception as e:
         raise e
+
+# Stream the summary from Google Gemini chunk by chunk as it is generated
+def generate_gemini_content_stream(transcript_text, transcript_items=None):
+    prompt = build_summary_prompt(transcript_text, transcript_items)
+    response = get_generative_model(MODEL_NAME).generate_content(prompt, stream=True)
+    for chunk in response:
+        if chunk.text:
+            yield chunk.text